@@ -159,19 +159,43 @@ class GainzAPI {
    * Obtener todos los ejercicios v2 con filtros y paginación
    * @param {Object} options - Opciones de búsqueda
    * @param {string} options.query - Término de búsqueda
-   * @param {string} options.muscle - Músculo específico
-   * @param {string} options.equipment - Equipamiento específico
+   * @param {string|string[]} options.muscle - Músculo principal (cualquiera de la lista)
+   * @param {string|string[]} options.secondaryMuscle - Músculo secundario (cualquiera de la lista)
+   * @param {string|string[]} options.equipment - Equipamiento (todos obligatorios)
+   * @param {string|string[]} options.equipmentAny - Al menos uno de estos equipamientos
+   * @param {string|string[]} options.excludeEquipment - Ninguno de estos equipamientos
+   * @param {string} options.difficultyMin - Dificultad mínima ('beginner', 'intermediate', 'advanced')
+   * @param {string} options.difficultyMax - Dificultad máxima
    * @param {number} options.page - Página (default: 1)
    * @param {number} options.limit - Límite por página (default: 50)
+   * @param {string} options.sort - Orden: 'id' (default) o 'name'
+   * @param {string} options.cursor - Paginación por cursor (scroll infinito): '' para la
+   *   primera página y luego `next_cursor`. Con cursor la respuesta es
+   *   `{items, next_cursor, total}` en lugar de un array.
+   * @param {string} options.view - 'full' (default) o 'card' (forma reducida para listados)
+   * @param {string|string[]} options.fields - Campos a devolver (`id` siempre se incluye)
+   * @param {boolean} options.facets - Incluir recuentos por faceta (músculo, equipamiento,
+   *   dificultad, etiqueta); la respuesta es `{items, total, facets}`.
    */
   async getExercisesV2(options = {}) {
     try {
       const params = new URLSearchParams();
       if (options.query) params.append('query', options.query);
-      if (options.muscle) params.append('muscle', options.muscle);
-      if (options.equipment) params.append('equipment', options.equipment);
+      const list = (value) => (Array.isArray(value) ? value.join(',') : value);
+      if (options.muscle) params.append('muscle', list(options.muscle));
+      if (options.secondaryMuscle) params.append('secondary_muscle', list(options.secondaryMuscle));
+      if (options.equipment) params.append('equipment_all', list(options.equipment));
+      if (options.equipmentAny) params.append('equipment_any', list(options.equipmentAny));
+      if (options.excludeEquipment) params.append('exclude_equipment', list(options.excludeEquipment));
+      if (options.difficultyMin) params.append('difficulty_min', options.difficultyMin);
+      if (options.difficultyMax) params.append('difficulty_max', options.difficultyMax);
       if (options.page) params.append('page', options.page.toString());
       if (options.limit) params.append('limit', options.limit.toString());
+      if (options.sort) params.append('sort', options.sort);
+      if (options.cursor !== undefined && options.cursor !== null) params.append('cursor', options.cursor);
+      if (options.facets) params.append('facets', 'true');
+      if (options.view) params.append('view', options.view);
+      if (options.fields) params.append('fields', list(options.fields));
 
       const url = `${this.baseURL}/v2/exercises/?${params.toString()}`;
       const response = await fetch(url);
@@ -209,6 +233,103 @@ class GainzAPI {
     }
   }
 
+  /**
+   * Obtener un ejercicio v2 por slug (enlaces profundos)
+   * @param {string} slug - Slug del ejercicio, p. ej. 'press-de-banca'
+   */
+  async getExerciseBySlugV2(slug) {
+    try {
+      const response = await fetch(`${this.baseURL}/v2/exercises/by-slug/${encodeURIComponent(slug)}`);
+
+      if (!response.ok) {
+        if (response.status === 404) {
+          throw new Error('Exercise not found');
+        }
+        throw new Error(`Failed to fetch exercise v2: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching exercise v2 by slug:', error);
+      throw error;
+    }
+  }
+
+  /**
+   * Cambios del catálogo v2 desde una versión (sincronización offline)
+   * @param {number} since - `version` de la última sincronización (0 = descarga completa)
+   * @param {string} view - 'full' (default) o 'card'
+   * @returns {Promise<{version: number, reset: boolean, upserts: Object[], deletes: number[]}>}
+   *   Si `reset` es true, `upserts` es el catálogo completo y sustituye a la copia local.
+   */
+  async getExerciseChangesV2(since = 0, view) {
+    try {
+      const params = new URLSearchParams({ since: since.toString() });
+      if (view) params.append('view', view);
+
+      const response = await fetch(`${this.baseURL}/v2/exercises/changes?${params.toString()}`);
+
+      if (!response.ok) {
+        throw new Error(`Failed to fetch exercise changes v2: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching exercise changes v2:', error);
+      throw error;
+    }
+  }
+
+  /**
+   * Obtener varios ejercicios v2 en una sola llamada (p. ej. los de una rutina)
+   * @param {Object} options
+   * @param {number[]} options.ids - IDs de ejercicios
+   * @param {string[]} options.slugs - Slugs de ejercicios
+   * @param {string} options.view - 'full' (default) o 'card'
+   * @returns {Promise<{items: Object[], missing_ids: number[], missing_slugs: string[]}>}
+   */
+  async getExercisesBatchV2({ ids = [], slugs = [], view } = {}) {
+    try {
+      const params = new URLSearchParams();
+      if (ids.length) params.append('ids', ids.join(','));
+      if (slugs.length) params.append('slugs', slugs.join(','));
+      if (view) params.append('view', view);
+
+      const response = await fetch(`${this.baseURL}/v2/exercises/batch?${params.toString()}`);
+
+      if (!response.ok) {
+        throw new Error(`Failed to fetch exercises batch v2: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching exercises batch v2:', error);
+      throw error;
+    }
+  }
+
+  /**
+   * Sugerencias para autocompletar el buscador (ignora acentos)
+   * @param {string} prefix - Texto escrito por el usuario
+   * @param {number} limit - Máximo de sugerencias (default: 10)
+   * @returns {Promise<Array<{id: number, slug: string, name: string}>>}
+   */
+  async suggestExercisesV2(prefix, limit = 10) {
+    try {
+      const params = new URLSearchParams({ prefix, limit: limit.toString() });
+      const response = await fetch(`${this.baseURL}/v2/exercises/suggest?${params.toString()}`);
+
+      if (!response.ok) {
+        throw new Error(`Failed to fetch suggestions: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching suggestions v2:', error);
+      throw error;
+    }
+  }
+
   /**
    * Crear nuevo ejercicio v2 (requiere autenticación)
    * @param {Object} exerciseData - Datos del ejercicio
@@ -281,6 +402,55 @@ class GainzAPI {
     }
   }
 
+  /**
+   * Modificar parcialmente un ejercicio v2 (JSON Merge Patch, requiere autenticación)
+   * Solo se escriben los campos que cambian; `null` restablece un campo.
+   * @param {number} exerciseId - ID del ejercicio
+   * @param {Object} changes - Campos a cambiar, p. ej. { tips: ['...'] }
+   * @param {string|null} etag - ETag leído antes (If-Match); si el ejercicio cambió desde entonces falla con 412
+   * @returns {Promise<{exercise: Object, etag: string|null}>}
+   */
+  async patchExerciseV2(exerciseId, changes, etag = null) {
+    try {
+      await this.loadStoredToken();
+      if (!this.token) {
+        throw new Error('Authentication required');
+      }
+
+      const headers = {
+        'Content-Type': 'application/merge-patch+json',
+        'Authorization': `Bearer ${this.token}`,
+      };
+      if (etag) {
+        headers['If-Match'] = etag;
+      }
+
+      const response = await fetch(`${this.baseURL}/v2/exercises/${exerciseId}`, {
+        method: 'PATCH',
+        headers,
+        body: JSON.stringify(changes),
+      });
+
+      if (!response.ok) {
+        if (response.status === 401) {
+          throw new Error('Authentication failed');
+        }
+        if (response.status === 404) {
+          throw new Error('Exercise not found');
+        }
+        if (response.status === 412) {
+          throw new Error('Exercise was modified by someone else');
+        }
+        throw new Error(`Failed to patch exercise: ${response.status}`);
+      }
+
+      return { exercise: await response.json(), etag: response.headers.get('ETag') };
+    } catch (error) {
+      console.error('Error patching exercise v2:', error);
+      throw error;
+    }
+  }
+
   /**
    * Eliminar ejercicio v2 (requiere autenticación)
    * @param {number} exerciseId - ID del ejercicio
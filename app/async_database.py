@@ -0,0 +1,268 @@
+"""Async counterpart of ``get_db_connection`` for ``async def`` handlers.
+
+Same query surface as the sync path: ``await conn.cursor()``, then
+``await cursor.execute(sql, params)`` and ``fetchone``/``fetchmany``/
+``fetchall`` returning dict-like rows, plus ``commit``/``rollback``. SQL is
+written once with the usual placeholders (``?`` on SQLite, ``%s`` on
+PostgreSQL), so the builders in app/queries.py serve both paths.
+
+SQLite goes through aiosqlite (one helper thread per connection) and
+PostgreSQL through an asyncpg pool; both are bounded by ``DB_POOL_SIZE`` +
+``DB_MAX_OVERFLOW`` and wait at most ``DB_POOL_TIMEOUT`` for a connection.
+"""
+import asyncio
+import itertools
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from .config import settings
+from .database import engine, sqlite_pragmas, sqlite_readonly_uri
+
+try:
+    import aiosqlite
+except ImportError:  # pragma: no cover - only needed for the SQLite async path
+    aiosqlite = None
+
+try:
+    import asyncpg
+except ImportError:  # pragma: no cover - only needed for the PostgreSQL async path
+    asyncpg = None
+
+# psycopg2 placeholders and escaped percent signs
+_PARAM = re.compile(r'%[s%]')
+
+_ROW_STATEMENT = re.compile(r'^\s*(SELECT|WITH|VALUES|SHOW)\b|\bRETURNING\b', re.IGNORECASE)
+
+
+def pool_capacity():
+    return settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+
+
+def numbered_placeholders(sql):
+    """``%s`` placeholders (psycopg2 style) -> ``$1, $2...`` (asyncpg style).
+
+    ``%%`` is psycopg2's escape for a literal ``%`` and becomes ``%``.
+    """
+    counter = itertools.count(1)
+    return _PARAM.sub(lambda m: '%' if m.group() == '%%' else f"${next(counter)}", sql)
+
+
+class AsyncPgCursor:
+    """Buffered cursor over an asyncpg connection, shaped like a DB-API cursor"""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._rows = []
+        self._position = 0
+        self.rowcount = -1
+
+    async def execute(self, sql, params=()):
+        raw = await self._connection.begin()
+        sql = numbered_placeholders(sql)
+        if _ROW_STATEMENT.search(sql):
+            self._rows = await raw.fetch(sql, *params)
+            self.rowcount = len(self._rows)
+        else:
+            status = await raw.execute(sql, *params)
+            self._rows = []
+            count = status.rsplit(' ', 1)[-1]
+            self.rowcount = int(count) if count.isdigit() else -1
+        self._position = 0
+        return self
+
+    async def fetchone(self):
+        rows = await self.fetchmany(1)
+        return rows[0] if rows else None
+
+    async def fetchmany(self, size=1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    async def fetchall(self):
+        return await self.fetchmany(len(self._rows) - self._position)
+
+
+class AsyncPgConnection:
+    """asyncpg connection with psycopg2-like transactions (opened by the first statement)"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._transaction = None
+
+    async def begin(self):
+        if self._transaction is None:
+            self._transaction = self._raw.transaction()
+            await self._transaction.start()
+        return self._raw
+
+    async def cursor(self):
+        return AsyncPgCursor(self)
+
+    async def commit(self):
+        if self._transaction is not None:
+            transaction, self._transaction = self._transaction, None
+            await transaction.commit()
+
+    async def rollback(self):
+        if self._transaction is not None:
+            transaction, self._transaction = self._transaction, None
+            await transaction.rollback()
+
+
+class SqlitePool:
+    """Bounded pool of aiosqlite connections with the managed SQLite profile.
+
+    aiosqlite resolves each call on the event loop that awaits it, so the
+    connections are not tied to a loop; waiting is a short poll rather than
+    an ``asyncio`` primitive for the same reason.
+    """
+
+    def __init__(self, path, capacity, timeout, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.capacity = capacity
+        self.timeout = timeout
+        self._idle = deque()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+                create = self._opened < self.capacity
+                if create:
+                    self._opened += 1
+            if create:
+                try:
+                    conn = await self._connect()
+                except BaseException:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+                return conn
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"No SQLite connection available after {self.timeout}s")
+            await asyncio.sleep(0.005)
+
+    async def _connect(self):
+        if self.readonly:
+            conn = aiosqlite.connect(sqlite_readonly_uri(self.path), uri=True)
+        else:
+            conn = aiosqlite.connect(self.path)
+        # Idle pooled connections must not keep the process alive at exit
+        getattr(conn, '_thread', conn).daemon = True
+        conn = await conn
+        try:
+            for pragma in sqlite_pragmas(self.readonly):
+                await conn.execute(f"PRAGMA {pragma}")
+        except BaseException:
+            await conn.close()
+            raise
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    async def release(self, conn):
+        try:
+            if conn.in_transaction:
+                await conn.rollback()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            await conn.close()
+            raise
+        with self._lock:
+            self._idle.append(conn)
+
+    async def close(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+            self._opened -= len(idle)
+        for conn in idle:
+            await conn.close()
+
+
+_sqlite_pools = {}
+_pg_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_sqlite_pool(readonly=False):
+    if aiosqlite is None:
+        raise RuntimeError("aiosqlite is required for async SQLite access")
+    with _pools_lock:
+        pool = _sqlite_pools.get(readonly)
+        if pool is None:
+            pool = _sqlite_pools[readonly] = SqlitePool(
+                engine.url.database, pool_capacity(), settings.DB_POOL_TIMEOUT, readonly
+            )
+        return pool
+
+
+async def _get_pg_pool():
+    # asyncpg pools belong to the event loop that created them (one per worker)
+    if asyncpg is None:
+        raise RuntimeError("asyncpg is required for async PostgreSQL access")
+    loop = asyncio.get_running_loop()
+    pool = _pg_pools.get(loop)
+    if pool is None:
+        pool = await asyncpg.create_pool(
+            settings.DATABASE_URL,
+            min_size=1,
+            max_size=pool_capacity(),
+            max_inactive_connection_lifetime=settings.DB_POOL_RECYCLE,
+        )
+        _pg_pools[loop] = pool
+    return pool
+
+
+@asynccontextmanager
+async def get_async_db_connection(readonly=False):
+    """Async context manager for database connections, borrowed from the async pool.
+
+    As with ``get_db_connection``, ``readonly=True`` uses ``mode=ro``
+    connections on SQLite.
+    """
+    if settings.is_postgresql:
+        pool = await _get_pg_pool()
+        async with pool.acquire(timeout=settings.DB_POOL_TIMEOUT) as raw:
+            conn = AsyncPgConnection(raw)
+            try:
+                yield conn
+            finally:
+                await conn.rollback()
+    else:
+        pool = _get_sqlite_pool(readonly)
+        conn = await pool.acquire()
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+
+
+async def fetch_all(sql, params=()):
+    """Run one read query on a pooled async connection and return every row"""
+    async with get_async_db_connection(readonly=True) as conn:
+        cursor = await conn.cursor()
+        await cursor.execute(sql, params)
+        return await cursor.fetchall()
+
+
+async def close_async_pools():
+    """Close idle async connections (application shutdown)"""
+    with _pools_lock:
+        sqlite_pools = list(_sqlite_pools.values())
+        pg_pools = list(_pg_pools.values())
+        _sqlite_pools.clear()
+        _pg_pools.clear()
+    for pool in sqlite_pools:
+        await pool.close()
+    for pool in pg_pools:
+        await pool.close()
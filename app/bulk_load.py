@@ -0,0 +1,333 @@
+"""Bulk loading of exercises for the migration endpoints and scripts.
+
+Sources are streamed: ``iter_json_array`` parses the top-level array of a
+JSON file one element at a time, ``normalize_items`` and ``convert`` turn
+elements into row tuples lazily and ``bulk_insert`` consumes them a batch at
+a time, so an import holds one batch in memory whatever the file size.
+
+Rows are inserted in batches inside the caller's transaction:
+``executemany`` on SQLite and ``COPY ... FROM STDIN`` on PostgreSQL, so
+re-seeding the catalog costs a few statements per thousand exercises
+instead of one round trip each. The search index, relations and catalog
+version are then refreshed once by the caller.
+
+``upsert_batch`` writes the same row tuples keyed by slug (insert or
+update) for ``POST /v2/exercises/bulk``.
+"""
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from itertools import islice
+
+from psycopg2.extras import execute_values
+
+from app.catalog import slugify
+from app.config import settings
+from app.sql import any_value, values_param
+
+logger = logging.getLogger(__name__)
+
+# Insert order of the row tuples built below (id is assigned by the database)
+LOAD_COLUMNS = (
+    'slug', 'name', 'summary', 'description', 'primary_muscle',
+    'secondary_muscles', 'equipment', 'difficulty', 'steps', 'tips', 'images',
+    'video_url', 'tags', 'variations', 'estimated', 'created_at', 'updated_at',
+)
+
+BATCH_SIZE = 1000
+
+# Bytes read from the source file at a time
+READ_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(path, read_size=READ_SIZE):
+    """Yield the elements of the JSON array stored in ``path`` one at a time.
+
+    Elements are decoded with ``json.JSONDecoder.raw_decode`` as soon as they
+    are complete in the read buffer, which only ever holds the current
+    element plus one read. Raises ValueError if the file is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        position = 0
+        eof = False
+
+        def fill(size):
+            nonlocal buffer, position, eof
+            chunk = f.read(size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+        def skip(chars):
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in chars:
+                    position += 1
+                if position < len(buffer) or eof:
+                    return
+                fill(read_size)
+
+        skip(_WHITESPACE)
+        if buffer[position:position + 1] != '[':
+            raise ValueError(f"{path} does not contain a JSON array")
+        position += 1
+        expect_value = True  # false right after an element, until its comma
+        after_comma = False  # a value must follow: "[1,]" is invalid
+
+        while True:
+            skip(_WHITESPACE)
+            if position >= len(buffer):
+                raise ValueError(f"Unexpected end of {path}")
+            char = buffer[position]
+            if char == ']':
+                if after_comma:
+                    raise ValueError(f"Trailing comma in {path}")
+                return
+            if char == ',' and not expect_value:
+                position += 1
+                expect_value = after_comma = True
+                continue
+            if not expect_value:
+                raise ValueError(f"Expected ',' or ']' in {path}")
+
+            size = read_size
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    # Only complete once the next ',' or ']' is in the buffer:
+                    # a number cut by the read ("12" of "125") also decodes
+                    following = buffer[end:].lstrip(_WHITESPACE)[:1]
+                    if following and following in ',]' or eof:
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise ValueError(f"Invalid JSON element in {path}")
+                # Incomplete element: read more, doubling for large ones
+                fill(size)
+                size *= 2
+            position = end
+            expect_value = after_comma = False
+            yield value
+
+
+def _merge_images(columns, embedded):
+    """Column images (relative urls) with the metadata of the embedded copy at the same position"""
+    if not isinstance(embedded, list):
+        return columns
+    return [
+        {**embedded[i], **image} if i < len(embedded) and isinstance(embedded[i], dict) and isinstance(image, dict) else image
+        for i, image in enumerate(columns)
+    ]
+
+
+def normalize_items(items):
+    """Unwrap rows exported with the whole exercise in a ``json_data`` column.
+
+    ``exercises_complete.json`` stores each exercise as a JSON string next to
+    a few columns (id, slug, name, images...); non-null columns win over the
+    embedded copy, except that images are merged per element: the column's
+    url with the embedded type, width and height. Other items pass through
+    unchanged.
+    """
+    for item in items:
+        if isinstance(item, dict) and isinstance(item.get('json_data'), str):
+            columns = {k: v for k, v in item.items() if k != 'json_data' and v is not None}
+            try:
+                embedded = json.loads(item['json_data'])
+            except json.JSONDecodeError:
+                logger.error(f"Invalid json_data for exercise {item.get('name', 'unknown')}")
+                embedded = {}
+            if not isinstance(embedded, dict):
+                embedded = {}
+            if isinstance(columns.get('images'), list):
+                columns['images'] = _merge_images(columns['images'], embedded.get('images'))
+            item = {**embedded, **columns}
+        yield item
+
+
+def row_from_v1(item, now):
+    """Row tuple for a legacy v1 record (``name``, ``muscle``, ``instructions``...)"""
+    steps = []
+    if item.get('instructions'):
+        steps = [{"order": 1, "instruction": item['instructions']}]
+    return (
+        slugify(item.get('name') or ''),
+        item.get('name'),
+        (item.get('instructions') or '')[:120],
+        item.get('instructions'),
+        item.get('muscle'),
+        json.dumps([]),  # secondary_muscles
+        json.dumps([item.get('equipment')] if item.get('equipment') else []),
+        item.get('difficulty'),
+        json.dumps(steps),
+        json.dumps([]),  # tips
+        json.dumps([]),  # images
+        None,  # video_url
+        json.dumps([]),  # tags
+        json.dumps([]),  # variations
+        None,  # estimated
+        now,
+        now,
+    )
+
+
+def row_from_item(item, now):
+    """Row tuple for a v1 or v2 record, coercing the v1 shapes of steps, images and equipment"""
+    steps_data = item.get('steps', [])
+    if isinstance(steps_data, str):
+        steps_data = [{"order": 1, "instruction": steps_data}]
+    elif not steps_data and item.get('instructions'):
+        steps_data = [{"order": 1, "instruction": item['instructions']}]
+
+    images_data = item.get('images', [])
+    if isinstance(images_data, str):
+        images_data = []
+
+    equipment_data = item.get('equipment', [])
+    if isinstance(equipment_data, str):
+        equipment_data = [equipment_data] if equipment_data else []
+
+    return (
+        item.get('slug') or slugify(item.get('name') or ''),
+        item.get('name') or '',
+        item.get('summary', (item.get('description') or item.get('instructions', ''))[:120]),
+        item.get('description', item.get('instructions', '')),
+        item.get('primary_muscle', item.get('muscle', '')),
+        json.dumps(item.get('secondary_muscles', [])),
+        json.dumps(equipment_data),
+        item.get('difficulty', 'intermediate'),
+        json.dumps(steps_data),
+        json.dumps(item.get('tips', [])),
+        json.dumps(images_data),
+        item.get('video_url'),
+        json.dumps(item.get('tags', [])),
+        json.dumps(item.get('variations', [])),
+        json.dumps(item.get('estimated')) if item.get('estimated') else None,
+        item.get('created_at', now),
+        item.get('updated_at', now),
+    )
+
+
+def convert(items, to_row, now):
+    """Yield ``to_row(item, now)`` for each item.
+
+    Items that fail to convert or lack a name or slug are logged and yield
+    None instead, which ``bulk_insert`` counts as skipped, so they never
+    reach the database (and cannot abort the load).
+    """
+    for item in items:
+        name = item.get('name') if isinstance(item, dict) else None
+        try:
+            row = to_row(item, now)
+        except Exception as e:
+            logger.error(f"Error migrating exercise {name or 'unknown'}: {e}")
+            yield None
+            continue
+        if not (row[0] or '').strip() or not (row[1] or '').strip():
+            logger.error(f"Skipping exercise without name or slug: {name or 'unknown'}")
+            yield None
+            continue
+        yield row
+
+
+def _copy_value(value):
+    """Encode one value for COPY's text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def _insert_batch(cursor, table, batch):
+    columns = ', '.join(LOAD_COLUMNS)
+    if settings.is_postgresql:
+        buffer = io.StringIO()
+        for row in batch:
+            buffer.write('\t'.join(_copy_value(v) for v in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buffer)
+    else:
+        placeholders = ', '.join('?' for _ in LOAD_COLUMNS)
+        cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", batch)
+
+
+def slug_ids(cursor, slugs, table='exercises'):
+    """``{slug: id}`` for those of ``slugs`` present in ``table``"""
+    if not slugs:
+        return {}
+    cursor.execute(f"SELECT id, slug FROM {table} WHERE {any_value('slug')}", (values_param(slugs),))
+    return {row['slug']: row['id'] for row in cursor.fetchall()}
+
+
+def upsert_batch(cursor, batch, table='exercises'):
+    """Insert row tuples (see LOAD_COLUMNS) or update the rows with their slug; the caller commits.
+
+    Slugs must be unique within ``batch``. Existing rows keep their id and
+    ``created_at``. Returns ``{slug: id}`` for the batch.
+    """
+    columns = ', '.join(LOAD_COLUMNS)
+    updates = ', '.join(f"{c} = excluded.{c}" for c in LOAD_COLUMNS if c not in ('slug', 'created_at'))
+    conflict = f"ON CONFLICT (slug) DO UPDATE SET {updates}"
+    if settings.is_postgresql:
+        execute_values(cursor, f"INSERT INTO {table} ({columns}) VALUES %s {conflict}", batch, page_size=len(batch))
+    else:
+        placeholders = ', '.join('?' for _ in LOAD_COLUMNS)
+        cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) {conflict}", batch)
+    return slug_ids(cursor, [row[0] for row in batch], table)
+
+
+def bulk_insert(cursor, rows, table='exercises', batch_size=BATCH_SIZE, total=None, skip_slugs=()):
+    """Insert row tuples (see LOAD_COLUMNS) in batches; the caller commits.
+
+    ``rows`` may be any iterable, consumed one batch at a time. None rows
+    (rejected by ``convert``) and rows whose slug was already loaded or is
+    in ``skip_slugs`` (e.g. already in the table) are skipped, so a bad
+    source file cannot abort the whole load. Progress is logged per batch;
+    returns ``{"rows", "skipped", "seconds", "rows_per_second"}``.
+    """
+    started = time.perf_counter()
+    rows = iter(rows)
+    seen = set(skip_slugs)
+    loaded = skipped = 0
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        batch = []
+        for row in chunk:
+            if row is None:
+                skipped += 1
+                continue
+            if row[0] in seen:
+                logger.warning(f"Skipping duplicate slug: {row[0]}")
+                skipped += 1
+                continue
+            seen.add(row[0])
+            batch.append(row)
+        if not batch:
+            continue
+        _insert_batch(cursor, table, batch)
+        loaded += len(batch)
+        elapsed = time.perf_counter() - started
+        progress = f"{loaded}/{total}" if total else str(loaded)
+        logger.info(f"Bulk load: {progress} rows ({loaded / elapsed:.0f} rows/s)")
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows": loaded,
+        "skipped": skipped,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(loaded / seconds) if seconds else None,
+    }
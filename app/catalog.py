@@ -0,0 +1,331 @@
+"""In-memory catalog snapshot for the v2 exercises API.
+
+The catalog is read on every request but only changes a few times a day, so
+the decoded exercises are kept in an immutable snapshot per worker. Writes
+bump ``catalog_meta.version`` in the same transaction and call
+``invalidate_catalog()``; other workers notice the new version on their next
+revalidation (at most every ``CATALOG_REVALIDATE_SECONDS``).
+"""
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from types import MappingProxyType
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import get_db_connection, get_catalog_meta, EXERCISE_COLUMNS
+from app.facets import FacetIndex
+from app.search import TrigramIndex, PrefixIndex, fold
+
+logger = logging.getLogger(__name__)
+
+DATA_FILE = Path(__file__).resolve().parent.parent / "data" / "exercises.json"
+
+JSON_FIELDS = ['secondary_muscles', 'equipment', 'steps', 'tips', 'images', 'tags', 'variations']
+LIST_FIELDS = JSON_FIELDS
+
+# Max memoized query results per snapshot (counts, matching id sets...)
+MEMO_SIZE = 1024
+
+
+def decode_exercise_row(row):
+    """Convert a DB row to a dict, decoding the JSON text columns"""
+    exercise = dict(row)
+    for field in JSON_FIELDS:
+        if field in exercise and exercise[field]:
+            if isinstance(exercise[field], str):
+                try:
+                    exercise[field] = json.loads(exercise[field])
+                except json.JSONDecodeError:
+                    exercise[field] = []
+
+    if 'estimated' in exercise and exercise['estimated']:
+        if isinstance(exercise['estimated'], str):
+            try:
+                exercise['estimated'] = json.loads(exercise['estimated'])
+            except json.JSONDecodeError:
+                exercise['estimated'] = None
+    return exercise
+
+
+def load_exercises_raw():
+    """Load exercises from database or fallback to JSON file.
+
+    Returns a ``(exercises, source)`` tuple where source is ``"database"`` or
+    ``"json"``.
+    """
+    try:
+        with get_db_connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(EXERCISE_COLUMNS)} FROM exercises ORDER BY id")
+            rows = cursor.fetchall()
+            if rows:
+                exercises = [decode_exercise_row(row) for row in rows]
+                logger.info(f"Loaded {len(exercises)} exercises from database")
+                return exercises, "database"
+            else:
+                logger.warning("No exercises found in database, loading from JSON file")
+
+    except Exception as e:
+        logger.error(f"Error loading exercises from database: {e}")
+        logger.info("Falling back to JSON file")
+
+    # Fallback to JSON file
+    try:
+        with open(DATA_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            logger.info(f"Loaded {len(data)} exercises from JSON file")
+            return data, "json"
+    except Exception as e:
+        logger.error(f"Error loading exercises from JSON file: {e}")
+        return [], "json"
+
+
+def iter_exercise_rows(batch_size=500):
+    """Yield batches of raw exercise rows in id order without loading the table.
+
+    PostgreSQL uses a named (server-side) cursor; SQLite cursors already
+    step through the result lazily. The connection stays open until the
+    generator is exhausted or closed.
+    """
+    with get_db_connection(readonly=True) as conn:
+        if settings.is_postgresql:
+            cursor = conn.cursor(name='exercise_export')
+            cursor.itersize = batch_size
+        else:
+            cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(EXERCISE_COLUMNS)} FROM exercises ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+
+
+def slugify(name: str) -> str:
+    """Canonical URL slug: "Press de Banca (Inclinado)" -> "press-de-banca-inclinado".
+
+    Accents are removed (ñ -> n), anything other than letters, digits,
+    spaces and hyphens is dropped and runs of spaces/hyphens become one
+    hyphen. Used by the API and the migration scripts alike.
+    """
+    slug = re.sub(r'[^a-z0-9\s-]', '', fold(name or ''))
+    return re.sub(r'[\s-]+', '-', slug).strip('-')
+
+
+def absolute_url(url):
+    """Resolve ``/static/...`` style URLs against ``PUBLIC_BASE_URL``"""
+    if url and url.startswith('/'):
+        return settings.PUBLIC_BASE_URL + url
+    return url
+
+
+def transform(old):
+    """Return the v2 representation of a stored row or a legacy v1 record"""
+    if 'slug' in old:
+        # Already a v2 row (database or v2 JSON)
+        exercise = dict(old)
+        for field in LIST_FIELDS:
+            exercise[field] = exercise.get(field) or []
+        exercise['images'] = [
+            {**img, 'url': absolute_url(img.get('url'))}
+            for img in exercise['images'] if isinstance(img, dict) and img.get('url')
+        ]
+        exercise['video_url'] = absolute_url(exercise.get('video_url'))
+        return exercise
+
+    now = datetime.utcnow().isoformat()
+    steps = []
+    if old.get('instructions'):
+        steps = [{"order": 1, "instruction": old['instructions']}]
+    return {
+        "id": old.get('id'),
+        "slug": slugify(old.get('name', '')),
+        "name": old.get('name'),
+        "summary": (old.get('instructions') or '')[:120],
+        "description": old.get('instructions'),
+        "primary_muscle": old.get('muscle'),
+        "secondary_muscles": [],
+        "equipment": [old.get('equipment')] if old.get('equipment') else [],
+        "difficulty": old.get('difficulty'),
+        "steps": steps,
+        "tips": [],
+        "images": [],
+        "video_url": None,
+        "tags": [],
+        "variations": [],
+        "estimated": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+class CatalogSnapshot:
+    """Decoded, v2-shaped view of the whole catalog at a given version.
+
+    The containers are read-only; the exercise dicts are shared between
+    requests and must not be mutated by callers.
+    """
+
+    __slots__ = ('version', 'modified_at', 'source', 'exercises', 'by_id', 'by_slug', 'text_index', 'prefix_index', 'facet_index', 'stats', 'built_at', '_memo', '_derived')
+
+    def __init__(self, version, exercises, source="database", previous=None, modified_at=None):
+        self.version = version
+        self.source = source
+        self.exercises = tuple(exercises)
+        self.by_id = MappingProxyType({e['id']: e for e in self.exercises if e.get('id') is not None})
+        self.by_slug = MappingProxyType(self._slug_index())
+        self.text_index = TrigramIndex(self.exercises)
+        self.prefix_index = PrefixIndex(self.exercises, previous.prefix_index if previous is not None else None)
+        self.facet_index = FacetIndex(self.exercises)
+        self.built_at = datetime.utcnow()
+        # When the catalog last changed (catalog_meta.updated_at), shared by all workers
+        self.modified_at = modified_at or self.built_at
+        self.stats = self._stats()
+        self._memo = {}
+        self._derived = {}
+
+    def _slug_index(self):
+        """Stored slugs, plus their canonical form as an alias when it is free.
+
+        Rows migrated before slugify() was canonical may have slugs like
+        "remo-con-barra-(t)"; the alias lets "remo-con-barra-t" resolve too.
+        """
+        index = {e['slug']: e for e in self.exercises if e.get('id') is not None and e.get('slug')}
+        for slug, exercise in list(index.items()):
+            index.setdefault(slugify(slug), exercise)
+        return index
+
+    def get(self, exercise_id):
+        """Return the exercise with ``exercise_id`` or None (cached 404)"""
+        return self.by_id.get(exercise_id)
+
+    def get_by_slug(self, slug):
+        """Return the exercise with ``slug`` (exact or canonical form) or None"""
+        exercise = self.by_slug.get(slug)
+        if exercise is None:
+            exercise = self.by_slug.get(slugify(slug))
+        return exercise
+
+    def _stats(self):
+        """Catalog aggregates, materialized once per version from the facet bitsets"""
+        return {
+            "total_exercises": len(self.exercises) if self.source == "database" else 0,
+            "muscle_groups": self.facet_index.totals('muscle', unknown='Unknown'),
+            "difficulty_levels": self.facet_index.totals('difficulty', unknown='Unknown'),
+            "equipment_types": self.facet_index.totals('equipment'),
+            "version": self.version,
+            "generated_at": self.built_at.isoformat(),
+        }
+
+    def derived(self, exercise_id, kind, build):
+        """Value derived from one exercise (validated dump, encoded view...), built once per version"""
+        key = (exercise_id, kind)
+        value = self._derived.get(key)
+        if value is None:
+            value = self._derived[key] = build(self.by_id[exercise_id])
+        return value
+
+    def memoize(self, key, compute):
+        """Cache ``compute()`` (e.g. a filtered COUNT(*)) for this version"""
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        value = self._memo[key] = compute()
+        return value
+
+    async def memoize_async(self, key, compute):
+        """``memoize`` for a coroutine function (async query path)"""
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        value = await compute()
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[key] = value
+        return value
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def parse_timestamp(value):
+    """Naive UTC datetime from a DB timestamp (datetime or SQLite text)"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _read_meta():
+    with get_db_connection(readonly=True) as conn:
+        version, updated_at = get_catalog_meta(conn.cursor())
+    return version, parse_timestamp(updated_at)
+
+
+def _build(version, previous=None, modified_at=None):
+    raw, source = load_exercises_raw()
+    snapshot = CatalogSnapshot(version, [transform(e) for e in raw], source, previous, modified_at)
+    logger.info(f"Catalog snapshot v{version} built with {len(snapshot.exercises)} exercises")
+    return snapshot
+
+
+def get_catalog():
+    """Return the current catalog snapshot, rebuilding it if the version changed"""
+    global _snapshot, _checked_at
+
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < settings.CATALOG_REVALIDATE_SECONDS:
+        return snapshot
+
+    with _lock:
+        # Another thread may have revalidated while we waited for the lock
+        if _snapshot is not None and time.monotonic() - _checked_at < settings.CATALOG_REVALIDATE_SECONDS:
+            return _snapshot
+        try:
+            version, modified_at = _read_meta()
+        except Exception as e:
+            logger.error(f"Error reading catalog version: {e}")
+            if _snapshot is not None:
+                return _snapshot
+            version, modified_at = 0, None
+
+        if _snapshot is None or _snapshot.version != version:
+            # Version is read before the rows, so a concurrent write can only
+            # make the snapshot newer than its label (never stale)
+            _snapshot = _build(version, _snapshot, modified_at)
+        _checked_at = time.monotonic()
+        return _snapshot
+
+
+async def get_catalog_async():
+    """``get_catalog()`` for async handlers.
+
+    A fresh snapshot is returned without leaving the event loop; the
+    revalidation query (and a rebuild, which is CPU-bound) runs in the
+    threadpool so it never blocks other requests.
+    """
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < settings.CATALOG_REVALIDATE_SECONDS:
+        return snapshot
+    return await run_in_threadpool(get_catalog)
+
+
+def invalidate_catalog():
+    """Force the next ``get_catalog()`` call to revalidate against the DB"""
+    global _checked_at
+    with _lock:
+        _checked_at = float('-inf')
@@ -0,0 +1,217 @@
+"""Zero-downtime replacement of the exercises catalog (force-migrate).
+
+The catalog is a set of objects that must always match: the exercises
+table, its full-text index (the ``exercises_fts`` table on SQLite, the
+``search_vector`` column on PostgreSQL), the relation join tables and
+their indexes. A new catalog is built as a complete shadow set (names
+ending in ``_shadow``): bulk loaded, validated, indexed and with its
+search index and relations filled, then committed without touching the
+live tables.
+
+The swap is a separate, short transaction that only renames: live ->
+``_swap`` -> ``_previous``, shadow -> live. On PostgreSQL that is
+``ALTER TABLE/INDEX ... RENAME`` alone, so the ACCESS EXCLUSIVE locks are
+held for milliseconds and readers see the complete old catalog until the
+commit and the complete new one after it. SQLite cannot rename indexes, so
+there the swap drops the live index names and builds them on the incoming
+tables; under WAL readers keep reading the last committed catalog
+meanwhile.
+
+A swap queued behind a long reader (an ``/export`` cursor, say) would
+make every new reader of the catalog queue behind it in turn, so on
+PostgreSQL the swap runs under ``lock_timeout``: if the locks are not
+granted in time it is rolled back and retried, and after
+``CATALOG_SWAP_ATTEMPTS`` tries ``swap_in`` raises TimeoutError, leaving
+the live catalog untouched.
+
+The replaced set is parked as ``_previous`` so a bad import can be undone
+with another swap (``rollback``); an older parked set is renamed to
+``_retired`` inside the swap and dropped afterwards (``drop_retired``).
+"""
+import logging
+import time
+
+import psycopg2.errors
+
+from app.config import settings
+from app.database import EXERCISE_INDEXES, exercises_table_statements, exercise_index_statements
+from app.fulltext import schema_statements as fts_schema_statements, sync_statements as fts_sync_statements
+from app.relations import (
+    RELATION_INDEXES, RELATION_TABLES,
+    table_statements as relation_table_statements,
+    index_statements as relation_index_statements,
+    sync_statements as relation_sync_statements,
+)
+
+SHADOW = '_shadow'
+PREVIOUS = '_previous'
+_SWAP = '_swap'
+_RETIRED = '_retired'
+
+SHADOW_TABLE = 'exercises' + SHADOW
+
+logger = logging.getLogger(__name__)
+
+JSON_COLUMNS = ('secondary_muscles', 'equipment', 'steps', 'tips', 'images', 'tags', 'variations')
+
+
+def catalog_tables():
+    """Tables swapped together (live names)"""
+    tables = ['exercises', *RELATION_TABLES.values()]
+    if not settings.is_postgresql:
+        tables.append('exercises_fts')
+    return tables
+
+
+def catalog_indexes():
+    """Named indexes of the catalog tables (live names)"""
+    return [*EXERCISE_INDEXES, *RELATION_INDEXES.values()]
+
+
+def begin(cursor):
+    """Open a transaction for DDL: sqlite3 only opens one implicitly before DML"""
+    if not settings.is_postgresql and not cursor.connection.in_transaction:
+        cursor.execute("BEGIN")
+
+
+def table_exists(cursor, table):
+    if settings.is_postgresql:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS present", (table,))
+    else:
+        cursor.execute("SELECT COUNT(*) > 0 AS present FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return bool(cursor.fetchone()['present'])
+
+
+def set_exists(cursor, suffix):
+    """True if every table of the set with ``suffix`` exists"""
+    return all(table_exists(cursor, f"{table}{suffix}") for table in catalog_tables())
+
+
+def _drop_set(cursor, suffix):
+    for table in catalog_tables():
+        cursor.execute(f"DROP TABLE IF EXISTS {table}{suffix}")
+
+
+def create_shadow(cursor):
+    """(Re)create an empty shadow set: exercises, join tables and (SQLite) FTS table"""
+    begin(cursor)
+    _drop_set(cursor, SHADOW)
+    for statement in exercises_table_statements(SHADOW_TABLE):
+        cursor.execute(statement)
+    for statement in relation_table_statements(SHADOW) + fts_schema_statements(SHADOW):
+        cursor.execute(statement)
+
+
+def validate_shadow(cursor, minimum=1):
+    """Check the loaded shadow table before it replaces the catalog.
+
+    Raises ValueError if it has fewer than ``minimum`` rows, rows without a
+    name or slug, or (SQLite) JSON columns that do not parse. Returns the
+    row count.
+    """
+    checks = "SUM(CASE WHEN TRIM(name) = '' OR TRIM(slug) = '' THEN 1 ELSE 0 END) AS blank"
+    if not settings.is_postgresql:
+        # JSONB columns are validated on insert
+        invalid = ' OR '.join(f"NOT json_valid(COALESCE({c}, '[]'))" for c in JSON_COLUMNS)
+        checks += f", SUM(CASE WHEN {invalid} THEN 1 ELSE 0 END) AS invalid"
+    cursor.execute(f"SELECT COUNT(*) AS count, {checks} FROM {SHADOW_TABLE}")
+    row = cursor.fetchone()
+
+    if row['count'] < minimum:
+        raise ValueError(f"New catalog has {row['count']} exercises, expected at least {minimum}")
+    if row['blank']:
+        raise ValueError(f"New catalog has {row['blank']} exercises without name or slug")
+    if not settings.is_postgresql and row['invalid']:
+        raise ValueError(f"New catalog has {row['invalid']} exercises with invalid JSON fields")
+    return row['count']
+
+
+def prepare_shadow(cursor):
+    """Fill the shadow's search index and relations and (PostgreSQL) build its indexes.
+
+    Runs before the swap, so none of this work locks the live tables. The
+    vocabulary (``terms``) is shared and only gains rows.
+    """
+    for statement in fts_sync_statements(suffix=SHADOW) + relation_sync_statements(suffix=SHADOW):
+        cursor.execute(statement)
+    if settings.is_postgresql:
+        for statement in exercise_index_statements(SHADOW) + relation_index_statements(SHADOW):
+            cursor.execute(statement)
+
+
+def _rename_table(cursor, table, new_name):
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {new_name}")
+
+
+def swap_in(cursor, incoming):
+    """Make the set with suffix ``incoming`` live and park the live one as ``_previous``.
+
+    An older parked set becomes ``_retired`` (see ``drop_retired``). Only
+    renames on PostgreSQL; the caller commits. Starts a new transaction on
+    PostgreSQL (anything uncommitted is rolled back) and raises
+    TimeoutError if the locks of the live tables cannot be taken.
+    """
+    if not settings.is_postgresql:
+        begin(cursor)
+        _swap(cursor, incoming)
+        return
+
+    attempts = max(settings.CATALOG_SWAP_ATTEMPTS, 1)
+    for attempt in range(1, attempts + 1):
+        cursor.connection.rollback()
+        # SET LOCAL: only for the swap's transaction, until the caller commits
+        cursor.execute(f"SET LOCAL lock_timeout = {int(settings.CATALOG_SWAP_LOCK_TIMEOUT_MS)}")
+        try:
+            _swap(cursor, incoming)
+            return
+        except psycopg2.errors.LockNotAvailable:
+            logger.warning(f"Catalog swap waited too long for locks (attempt {attempt}/{attempts})")
+            cursor.connection.rollback()
+            if attempt < attempts:
+                time.sleep(0.5 * attempt)
+    raise TimeoutError(f"Catalog tables stayed locked by other sessions; retried the swap {attempts} times")
+
+
+def _swap(cursor, incoming):
+    if incoming != PREVIOUS:
+        for table in catalog_tables():
+            if table_exists(cursor, f"{table}{PREVIOUS}"):
+                _rename_table(cursor, f"{table}{PREVIOUS}", f"{table}{_RETIRED}")
+        if settings.is_postgresql:
+            for name in catalog_indexes():
+                cursor.execute(f"ALTER INDEX IF EXISTS {name}{PREVIOUS} RENAME TO {name}{_RETIRED}")
+
+    if not settings.is_postgresql:
+        # No ALTER INDEX ... RENAME: the live names move to the incoming tables below
+        for name in catalog_indexes():
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    for table in catalog_tables():
+        _rename_table(cursor, table, f"{table}{_SWAP}")
+        _rename_table(cursor, f"{table}{incoming}", table)
+        _rename_table(cursor, f"{table}{_SWAP}", f"{table}{PREVIOUS}")
+
+    if settings.is_postgresql:
+        for name in catalog_indexes():
+            cursor.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}{_SWAP}")
+            cursor.execute(f"ALTER INDEX IF EXISTS {name}{incoming} RENAME TO {name}")
+            cursor.execute(f"ALTER INDEX IF EXISTS {name}{_SWAP} RENAME TO {name}{PREVIOUS}")
+    # Builds the indexes on SQLite; on PostgreSQL a no-op unless the incoming set lacked one
+    for statement in exercise_index_statements() + relation_index_statements():
+        cursor.execute(statement)
+
+
+def drop_retired(cursor):
+    """Drop the set retired by the last swap, after its commit; the caller commits"""
+    begin(cursor)
+    _drop_set(cursor, _RETIRED)
+
+
+def rollback(cursor):
+    """Swap the parked catalog back in (the current one becomes the parked one).
+
+    Raises LookupError if there is no previous catalog.
+    """
+    if not set_exists(cursor, PREVIOUS):
+        raise LookupError("No previous catalog to roll back to")
+    swap_in(cursor, PREVIOUS)
@@ -0,0 +1,105 @@
+"""Change log behind ``GET /v2/exercises/changes`` (offline sync).
+
+Every v2 write records, in its own transaction and under the catalog
+version it bumped, which exercise changed: ``upsert`` or ``delete``
+(tombstone). Bulk rewrites (migrate, force-migrate) record a single
+``reset`` instead, telling clients older than it to reload everything.
+
+The log is compacted as it is written: only the latest entry per exercise
+is kept, and tombstones older than ``CHANGES_RETENTION_DAYS`` are replaced
+by a reset marker, so the table stays roughly one row per exercise.
+"""
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.sql import any_id, id_rows, ids_param
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+RESET = 'reset'
+
+
+def _placeholder():
+    return '%s' if settings.is_postgresql else '?'
+
+
+def record_change(cursor, version, exercise_id, op=UPSERT):
+    """Log an upsert/delete of ``exercise_id`` at ``version``, replacing older entries"""
+    p = _placeholder()
+    cursor.execute(f"DELETE FROM exercise_changes WHERE exercise_id = {p}", (exercise_id,))
+    cursor.execute(
+        f"INSERT INTO exercise_changes (version, exercise_id, op) VALUES ({p}, {p}, {p})",
+        (version, exercise_id, op),
+    )
+    expire_tombstones(cursor)
+
+
+def record_changes(cursor, version, exercise_ids, op=UPSERT):
+    """``record_change`` for several exercises written under one version (fixed statement count)"""
+    p = _placeholder()
+    ids = ids_param(exercise_ids)
+    cursor.execute(f"DELETE FROM exercise_changes WHERE {any_id('exercise_id')}", (ids,))
+    cursor.execute(
+        f"INSERT INTO exercise_changes (version, exercise_id, op) SELECT {p}, value, {p} FROM {id_rows()}",
+        (version, op, ids),
+    )
+    expire_tombstones(cursor)
+
+
+def record_reset(cursor, version):
+    """Log a full rewrite of the catalog at ``version``; earlier entries become moot"""
+    p = _placeholder()
+    cursor.execute("DELETE FROM exercise_changes")
+    cursor.execute(
+        f"INSERT INTO exercise_changes (version, exercise_id, op) VALUES ({p}, NULL, {p})",
+        (version, RESET),
+    )
+
+
+def expire_tombstones(cursor, days=None):
+    """Drop tombstones older than the retention window behind a reset marker"""
+    p = _placeholder()
+    days = settings.CHANGES_RETENTION_DAYS if days is None else days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    if not settings.is_postgresql:
+        # Same text format as SQLite's CURRENT_TIMESTAMP
+        cutoff = cutoff.strftime('%Y-%m-%d %H:%M:%S')
+
+    cursor.execute(
+        f"SELECT MAX(version) AS version FROM exercise_changes WHERE op = {p} AND changed_at < {p}",
+        (DELETE, cutoff),
+    )
+    row = cursor.fetchone()
+    expired = row['version'] if row else None
+    if expired is None:
+        return
+    cursor.execute(f"DELETE FROM exercise_changes WHERE op = {p} AND changed_at < {p}", (DELETE, cutoff))
+    cursor.execute(f"DELETE FROM exercise_changes WHERE op = {p} AND version <= {p}", (RESET, expired))
+    cursor.execute(
+        f"INSERT INTO exercise_changes (version, exercise_id, op) VALUES ({p}, NULL, {p})",
+        (expired, RESET),
+    )
+
+
+def changes_query(since, until):
+    """``(sql, params)`` reading the log entries for versions in ``(since, until]``"""
+    p = _placeholder()
+    sql = f"SELECT version, exercise_id, op FROM exercise_changes WHERE version > {p} AND version <= {p} ORDER BY version"
+    return sql, (since, until)
+
+
+def fold_changes(since, until, rows):
+    """Return ``(reset, {exercise_id: op})`` from the rows of ``changes_query``.
+
+    ``reset`` is True when the client must reload the whole catalog: a bulk
+    rewrite or tombstone expiry happened after ``since``, or ``since`` is
+    ahead of the catalog (e.g. the database was recreated).
+    """
+    if since > until:
+        return True, {}
+    ops = {}
+    for row in rows:
+        if row['op'] == RESET:
+            return True, {}
+        ops[row['exercise_id']] = row['op']
+    return False, ops
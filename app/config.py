@@ -43,6 +43,34 @@ class Settings:
     def is_production(self) -> bool:
         return self.ENVIRONMENT == "production" or self.DATABASE_URL.startswith(("postgresql://", "postgres://"))
     
+    # Catálogo en memoria: cada cuántos segundos se comprueba la versión en la DB
+    # (necesario cuando hay varios workers de gunicorn escribiendo)
+    CATALOG_REVALIDATE_SECONDS: float = float(os.getenv("CATALOG_REVALIDATE_SECONDS", "2"))
+
+    # Base pública para resolver URLs relativas de imágenes (/static/images/...)
+    PUBLIC_BASE_URL: str = os.getenv("PUBLIC_BASE_URL", "https://gainz-api.onrender.com").rstrip("/")
+
+    # Pool de conexiones por worker (compartido por routers y scripts vía get_db_connection)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Vida máxima de una conexión en segundos (se recicla al superarla)
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "300"))
+
+    # Perfil SQLite (ver app/database.py): memoria mapeada y caché de páginas por conexión, en MB,
+    # y espera máxima en ms cuando otra conexión tiene la base bloqueada
+    SQLITE_MMAP_SIZE_MB: int = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+    SQLITE_CACHE_SIZE_MB: int = int(os.getenv("SQLITE_CACHE_SIZE_MB", "64"))
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    # Sustitución del catálogo en PostgreSQL (app/catalog_swap.py): espera máxima en ms por los
+    # bloqueos de las tablas vivas en cada intento, y número de intentos antes de rendirse
+    CATALOG_SWAP_LOCK_TIMEOUT_MS: int = int(os.getenv("CATALOG_SWAP_LOCK_TIMEOUT_MS", "2000"))
+    CATALOG_SWAP_ATTEMPTS: int = int(os.getenv("CATALOG_SWAP_ATTEMPTS", "3"))
+
+    # Días que se conservan las bajas (tombstones) en el log de cambios para /v2/exercises/changes
+    CHANGES_RETENTION_DAYS: int = int(os.getenv("CHANGES_RETENTION_DAYS", "30"))
+
     MAX_FILE_SIZE: int = 5 * 1024 * 1024  # 5MB
     ALLOWED_FILE_TYPES = ["image/jpeg", "image/png", "image/webp"]
 
@@ -1,30 +1,100 @@
 import os
 import sqlite3
+import threading
+import time
 import psycopg2
 import psycopg2.extras  # ⭐ Agregamos esta importación
 from contextlib import contextmanager
-from sqlalchemy import create_engine, text
+from pathlib import Path
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .fulltext import TS_CONFIG, config_statements as fts_config_statements, schema_statements as fts_schema_statements, sync_statements
+from .relations import schema_statements as relation_schema_statements, sync_statements as relation_sync_statements
+
+# Columns of the exercises table exposed by the API (excludes search internals)
+EXERCISE_COLUMNS = (
+    'id', 'slug', 'name', 'summary', 'description', 'primary_muscle',
+    'secondary_muscles', 'equipment', 'difficulty', 'steps', 'tips', 'images',
+    'video_url', 'tags', 'variations', 'estimated', 'created_at', 'updated_at',
+)
 
 # Configuración específica según el tipo de base de datos
+# Pool compartido: pre-ping como health check, reciclado por vida máxima y overflow acotado
+POOL_OPTIONS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+
 if settings.is_postgresql:
     # Configuración para PostgreSQL en producción
     engine = create_engine(
         settings.DATABASE_URL,
-        pool_pre_ping=True,
-        pool_recycle=300,
-        echo=False  # Cambiar a True para debug
+        echo=False,  # Cambiar a True para debug
+        **POOL_OPTIONS
     )
 else:
-    # Configuración para SQLite en desarrollo
+    # Configuración para SQLite (desarrollo y despliegues pequeños)
     engine = create_engine(
         settings.DATABASE_URL,
         connect_args={"check_same_thread": False},  # Solo para SQLite
-        echo=True  # Para ver las consultas SQL en desarrollo
+        echo=False,  # Cambiar a True para ver las consultas SQL
+        **POOL_OPTIONS
     )
 
+
+def sqlite_pragmas(readonly=False):
+    """PRAGMAs of the managed SQLite profile, applied to every new connection.
+
+    WAL lets readers proceed while a writer commits (across gunicorn workers
+    too) and makes ``synchronous=NORMAL`` safe. The journal mode is stored
+    in the database file, so read-only connections skip the write-side
+    settings.
+    """
+    pragmas = [] if readonly else ["journal_mode=WAL", "synchronous=NORMAL"]
+    return pragmas + [
+        f"busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"mmap_size={settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024}",
+        # Negative cache_size is in KiB
+        f"cache_size={-settings.SQLITE_CACHE_SIZE_MB * 1024}",
+        "temp_store=MEMORY",
+    ]
+
+
+def apply_sqlite_pragmas(dbapi_connection, readonly=False):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas(readonly):
+            cursor.execute(f"PRAGMA {pragma}")
+    finally:
+        cursor.close()
+
+
+def sqlite_readonly_uri(path=None):
+    """``file:`` URI opening the database file with ``mode=ro``"""
+    return Path(path or engine.url.database).resolve().as_uri() + "?mode=ro"
+
+
+if settings.is_postgresql:
+    read_engine = engine
+else:
+    @event.listens_for(engine, "connect")
+    def _on_sqlite_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection)
+
+    def _connect_reader():
+        conn = sqlite3.connect(sqlite_readonly_uri(), uri=True, check_same_thread=False)
+        apply_sqlite_pragmas(conn, readonly=True)
+        return conn
+
+    # Lecturas por conexiones mode=ro separadas: con WAL no esperan al escritor
+    read_engine = create_engine("sqlite://", creator=_connect_reader, poolclass=QueuePool, **POOL_OPTIONS)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -36,72 +106,235 @@ def get_db():
     finally:
         db.close()
 
+class PooledConnection:
+    """DB-API connection checked out from the engine pool.
+
+    Behaves like the raw psycopg2/sqlite3 connection, except that cursors
+    return dict-like rows (RealDictCursor / sqlite3.Row) as the routers
+    expect. Closing returns it to the pool, rolling back anything not
+    committed.
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def cursor(self, *args, **kwargs):
+        if settings.is_postgresql:
+            kwargs.setdefault('cursor_factory', psycopg2.extras.RealDictCursor)
+            return self._raw.cursor(*args, **kwargs)
+        cursor = self._raw.cursor(*args, **kwargs)
+        cursor.row_factory = sqlite3.Row
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+_pool_lock = threading.Lock()
+_pool_metrics = {"checkouts": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+
 @contextmanager
-def get_db_connection():
-    """Context manager for database connections"""
-    if settings.is_postgresql:
-        # ⭐ Corrección: usar cursor_factory en la conexión
-        conn = psycopg2.connect(settings.DATABASE_URL, cursor_factory=psycopg2.extras.RealDictCursor)
-    else:
-        conn = sqlite3.connect(settings.DATABASE_URL.replace("sqlite:///", ""))
-        conn.row_factory = sqlite3.Row
-    
+def get_db_connection(readonly=False):
+    """Context manager for database connections, borrowed from the shared pool.
+
+    ``readonly=True`` borrows from the reader pool instead (``mode=ro``
+    connections on SQLite, the same pool on PostgreSQL).
+    """
+    started = time.perf_counter()
+    raw = (read_engine if readonly else engine).raw_connection()
+    waited = time.perf_counter() - started
+    with _pool_lock:
+        _pool_metrics["checkouts"] += 1
+        _pool_metrics["wait_total"] += waited
+        _pool_metrics["wait_max"] = max(_pool_metrics["wait_max"], waited)
+
     try:
-        yield conn
+        yield PooledConnection(raw)
     finally:
-        conn.close()
+        raw.close()
+
+def _pool_occupancy(pool):
+    return {
+        "size": pool.size() if hasattr(pool, 'size') else None,
+        "checked_out": pool.checkedout() if hasattr(pool, 'checkedout') else None,
+        "overflow": pool.overflow() if hasattr(pool, 'overflow') else None,
+    }
+
+def get_pool_stats():
+    """Pool occupancy and checkout wait times for this worker"""
+    with _pool_lock:
+        checkouts = _pool_metrics["checkouts"]
+        wait_total = _pool_metrics["wait_total"]
+        wait_max = _pool_metrics["wait_max"]
+    stats = {
+        **_pool_occupancy(engine.pool),
+        "checkouts": checkouts,
+        "avg_wait_ms": round(wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+        "max_wait_ms": round(wait_max * 1000, 3),
+    }
+    if read_engine is not engine:
+        stats["readers"] = _pool_occupancy(read_engine.pool)
+    return stats
+
+# Indexes of the exercises table used by the v2 list filters, sorting and search
+EXERCISE_INDEXES = {
+    'idx_exercises_primary_muscle': "(LOWER(primary_muscle))",
+    'idx_exercises_difficulty_lower': "(LOWER(difficulty))",
+    'idx_exercises_updated_at': "(updated_at)",
+    'idx_exercises_name_id': "(name, id)",
+}
+if settings.is_postgresql:
+    EXERCISE_INDEXES['idx_exercises_search'] = "USING GIN (search_vector)"
+
+def exercises_table_statements(table='exercises'):
+    """CREATE statements for an exercises table named ``table`` (without indexes)"""
+    if settings.is_postgresql:
+        return [
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id SERIAL PRIMARY KEY,
+                slug VARCHAR(255) UNIQUE NOT NULL,
+                name VARCHAR(255) NOT NULL,
+                summary TEXT,
+                description TEXT,
+                primary_muscle VARCHAR(100),
+                secondary_muscles JSONB DEFAULT '[]',
+                equipment JSONB DEFAULT '[]',
+                difficulty VARCHAR(50),
+                steps JSONB DEFAULT '[]',
+                tips JSONB DEFAULT '[]',
+                images JSONB DEFAULT '[]',
+                video_url VARCHAR(500),
+                tags JSONB DEFAULT '[]',
+                variations JSONB DEFAULT '[]',
+                estimated JSONB,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector",
+        ]
+    return [
+        f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                slug TEXT UNIQUE NOT NULL,
+                name TEXT NOT NULL,
+                summary TEXT,
+                description TEXT,
+                primary_muscle TEXT,
+                secondary_muscles TEXT DEFAULT '[]',
+                equipment TEXT DEFAULT '[]',
+                difficulty TEXT,
+                steps TEXT DEFAULT '[]',
+                tips TEXT DEFAULT '[]',
+                images TEXT DEFAULT '[]',
+                video_url TEXT,
+                tags TEXT DEFAULT '[]',
+                variations TEXT DEFAULT '[]',
+                estimated TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+    ]
+
+def exercise_index_statements(suffix=''):
+    """CREATE INDEX statements for ``exercises<suffix>``, index names ending in ``suffix`` (see EXERCISE_INDEXES)"""
+    return [
+        f"CREATE INDEX IF NOT EXISTS {name}{suffix} ON exercises{suffix} {columns}"
+        for name, columns in EXERCISE_INDEXES.items()
+    ]
 
 def init_database():
     """Initialize database tables"""
     try:
         with engine.connect() as conn:
-            # Create exercises table
+            # Create exercises table and its indexes
+            for statement in exercises_table_statements():
+                conn.execute(text(statement))
+            conn.execute(text("DROP INDEX IF EXISTS idx_exercises_difficulty"))
+            for statement in exercise_index_statements():
+                conn.execute(text(statement))
+
+            # Full-text search index (see app/fulltext.py)
+            if settings.is_postgresql:
+                # Vectors built before TS_CONFIG existed still keep their accents: rebuild them all
+                config_missing = not conn.execute(
+                    text("SELECT COUNT(*) FROM pg_ts_config WHERE cfgname = :name"), {'name': TS_CONFIG}
+                ).scalar()
+                if config_missing:
+                    for statement in fts_config_statements():
+                        conn.execute(text(statement))
+                stale = config_missing or conn.execute(text("SELECT COUNT(*) FROM exercises WHERE search_vector IS NULL")).scalar()
+            else:
+                for statement in fts_schema_statements():
+                    conn.execute(text(statement))
+                stale = conn.execute(text(
+                    "SELECT (SELECT COUNT(*) FROM exercises) != (SELECT COUNT(*) FROM exercises_fts)"
+                )).scalar()
+            if stale:
+                for statement in sync_statements():
+                    conn.execute(text(statement))
+
+            # Normalized list fields (see app/relations.py); backfilled from the JSON columns once
+            relations_missing = not inspect(conn).has_table('terms')
+            for statement in relation_schema_statements():
+                conn.execute(text(statement))
+            if relations_missing:
+                for statement in relation_sync_statements():
+                    conn.execute(text(statement))
+
+            # Catalog version: bumped by every write so in-memory caches know when to rebuild
             if settings.is_postgresql:
                 conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS exercises (
-                        id SERIAL PRIMARY KEY,
-                        slug VARCHAR(255) UNIQUE NOT NULL,
-                        name VARCHAR(255) NOT NULL,
-                        summary TEXT,
-                        description TEXT,
-                        primary_muscle VARCHAR(100),
-                        secondary_muscles JSONB DEFAULT '[]',
-                        equipment JSONB DEFAULT '[]',
-                        difficulty VARCHAR(50),
-                        steps JSONB DEFAULT '[]',
-                        tips JSONB DEFAULT '[]',
-                        images JSONB DEFAULT '[]',
-                        video_url VARCHAR(500),
-                        tags JSONB DEFAULT '[]',
-                        variations JSONB DEFAULT '[]',
-                        estimated JSONB,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    CREATE TABLE IF NOT EXISTS catalog_meta (
+                        id INTEGER PRIMARY KEY,
+                        version BIGINT NOT NULL DEFAULT 0,
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 """))
+                conn.execute(text("INSERT INTO catalog_meta (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING"))
             else:
                 conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS exercises (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        slug TEXT UNIQUE NOT NULL,
-                        name TEXT NOT NULL,
-                        summary TEXT,
-                        description TEXT,
-                        primary_muscle TEXT,
-                        secondary_muscles TEXT DEFAULT '[]',
-                        equipment TEXT DEFAULT '[]',
-                        difficulty TEXT,
-                        steps TEXT DEFAULT '[]',
-                        tips TEXT DEFAULT '[]',
-                        images TEXT DEFAULT '[]',
-                        video_url TEXT,
-                        tags TEXT DEFAULT '[]',
-                        variations TEXT DEFAULT '[]',
-                        estimated TEXT,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    CREATE TABLE IF NOT EXISTS catalog_meta (
+                        id INTEGER PRIMARY KEY,
+                        version INTEGER NOT NULL DEFAULT 0,
                         updated_at TEXT DEFAULT CURRENT_TIMESTAMP
                     )
                 """))
+                conn.execute(text("INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0)"))
+
+            # Change log for delta sync (see app/changes.py)
+            if settings.is_postgresql:
+                conn.execute(text("""
+                    CREATE TABLE IF NOT EXISTS exercise_changes (
+                        id BIGSERIAL PRIMARY KEY,
+                        version BIGINT NOT NULL,
+                        exercise_id INTEGER,
+                        op VARCHAR(10) NOT NULL,
+                        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """))
+            else:
+                conn.execute(text("""
+                    CREATE TABLE IF NOT EXISTS exercise_changes (
+                        id INTEGER PRIMARY KEY,
+                        version INTEGER NOT NULL,
+                        exercise_id INTEGER,
+                        op TEXT NOT NULL,
+                        changed_at TEXT DEFAULT CURRENT_TIMESTAMP
+                    )
+                """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_exercise_changes_version ON exercise_changes (version)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_exercise_changes_exercise ON exercise_changes (exercise_id)"))
+            # History before the log existed is unknown: clients older than now must reload
+            conn.execute(text("""
+                INSERT INTO exercise_changes (version, exercise_id, op)
+                SELECT version, NULL, 'reset' FROM catalog_meta
+                WHERE id = 1 AND NOT EXISTS (SELECT 1 FROM exercise_changes)
+            """))
             conn.commit()
     except Exception as e:
         print(f"Error initializing database: {e}")
@@ -116,3 +349,20 @@ def get_exercise_count():
     except Exception as e:
         print(f"Error getting exercise count: {e}")
         return 0
+
+def bump_catalog_version(cursor):
+    """Increment the catalog version inside the caller's transaction and return it"""
+    cursor.execute("UPDATE catalog_meta SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1")
+    return get_catalog_version(cursor)
+
+def get_catalog_version(cursor):
+    """Read the current catalog version using an open cursor"""
+    return get_catalog_meta(cursor)[0]
+
+def get_catalog_meta(cursor):
+    """Return ``(version, updated_at)`` of the catalog; updated_at may be None"""
+    cursor.execute("SELECT version, updated_at FROM catalog_meta WHERE id = 1")
+    row = cursor.fetchone()
+    if not row:
+        return 0, None
+    return row['version'], row['updated_at']
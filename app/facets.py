@@ -0,0 +1,122 @@
+"""Bitset facet index over a catalog snapshot.
+
+Each exercise gets a bit position; every facet value (primary muscle,
+equipment item, difficulty, tag) maps to a Python int with the bits of the
+exercises that have it. Filters are intersections (``&``) of those ints and
+counts are ``int.bit_count()``, so a whole filter screen is answered with a
+handful of word-level operations instead of walking the catalog.
+"""
+
+# API name -> exercise field; list fields contribute one value per item
+FACET_FIELDS = {
+    'muscle': 'primary_muscle',
+    'secondary_muscle': 'secondary_muscles',
+    'equipment': 'equipment',
+    'difficulty': 'difficulty',
+    'tag': 'tags',
+}
+LIST_FACETS = ('secondary_muscle', 'equipment', 'tag')
+
+
+def facet_key(value):
+    return value.strip().lower()
+
+
+class FacetIndex:
+    def __init__(self, exercises):
+        self.ids = []
+        self.positions = {}
+        self.values = {facet: {} for facet in FACET_FIELDS}
+        self.labels = {facet: {} for facet in FACET_FIELDS}
+
+        for position, exercise in enumerate(exercises):
+            exercise_id = exercise.get('id')
+            self.ids.append(exercise_id)
+            if exercise_id is not None:
+                self.positions[exercise_id] = position
+            bit = 1 << position
+            for facet, field in FACET_FIELDS.items():
+                raw = exercise.get(field)
+                for value in (raw if isinstance(raw, list) else [raw]):
+                    if not isinstance(value, str) or not value.strip():
+                        continue
+                    key = facet_key(value)
+                    self.values[facet][key] = self.values[facet].get(key, 0) | bit
+                    self.labels[facet].setdefault(key, value)
+        self.all = (1 << len(self.ids)) - 1
+
+    def bits(self, facet, value):
+        """Bits of the exercises having ``value`` for ``facet`` (0 if unknown)"""
+        return self.values[facet].get(facet_key(value), 0)
+
+    def bits_of_ids(self, exercise_ids):
+        bits = 0
+        for exercise_id in exercise_ids:
+            position = self.positions.get(exercise_id)
+            if position is not None:
+                bits |= 1 << position
+        return bits
+
+    def select(self, filters, base=None, skip=None):
+        """Evaluate ``(facet, op, values)`` filters (see queries.parse_filters).
+
+        ``any`` ORs the value bitsets, ``all`` ANDs them and ``none`` removes
+        them; the result is ANDed with ``base``. Filters on ``skip`` are ignored.
+        """
+        bits = self.all if base is None else base
+        for facet, op, values in filters:
+            if facet == skip:
+                continue
+            if op == 'all':
+                for value in values:
+                    bits &= self.bits(facet, value)
+                continue
+            union = 0
+            for value in values:
+                union |= self.bits(facet, value)
+            bits = bits & ~union if op == 'none' else bits & union
+        return bits
+
+    def ids_of(self, bits):
+        """Exercise ids for ``bits`` in snapshot order"""
+        ids = []
+        binary = bin(bits)[:1:-1]
+        position = binary.find('1')
+        while position != -1:
+            ids.append(self.ids[position])
+            position = binary.find('1', position + 1)
+        return ids
+
+    def totals(self, facet, unknown=None):
+        """``{value: count}`` over the whole catalog.
+
+        For single-valued facets, exercises without a value are counted under
+        ``unknown`` when given.
+        """
+        totals = {self.labels[facet][key]: bits.bit_count() for key, bits in self.values[facet].items()}
+        if unknown is not None and facet not in LIST_FACETS:
+            covered = 0
+            for bits in self.values[facet].values():
+                covered |= bits
+            missing = len(self.ids) - covered.bit_count()
+            if missing:
+                totals[unknown] = totals.get(unknown, 0) + missing
+        return totals
+
+    def counts(self, filters, base=None):
+        """Per-facet value counts for the current filters.
+
+        Counts for a facet ignore that facet's own filter, so a screen filtered
+        by ``muscle=chest`` still shows how many results picking another
+        muscle would give. Values with no matches are omitted.
+        """
+        out = {}
+        for facet in FACET_FIELDS:
+            scope = self.select(filters, base, skip=facet)
+            facet_counts = {}
+            for key, bits in self.values[facet].items():
+                count = (bits & scope).bit_count()
+                if count:
+                    facet_counts[self.labels[facet][key]] = count
+            out[facet] = facet_counts
+        return out
@@ -0,0 +1,115 @@
+"""Full-text search index for v2 exercises.
+
+SQLite uses an FTS5 table (``exercises_fts``) keyed by the exercise id and
+PostgreSQL a weighted ``search_vector`` column with a GIN index. In both
+cases the name ranks above tags, tags above the summary and the summary above
+description and step instructions, and accents are ignored: FTS5 removes
+diacritics and PostgreSQL indexes and queries with ``TS_CONFIG``, the
+Spanish configuration with the ``unaccent`` dictionary in front of the
+stemmer (see ``config_statements``).
+
+The index is maintained explicitly: every v2 write calls
+``sync_search_index`` inside its own transaction.
+"""
+import re
+
+from app.config import settings
+from app.sql import any_id, ids_param
+
+# exercises columns the index is built from
+INDEXED_COLUMNS = ('name', 'tags', 'summary', 'description', 'steps')
+
+# bm25() column weights for exercises_fts(name, tags, summary, description, steps)
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0, 1.0)
+
+# PostgreSQL text search configuration for the vector, the tsquery and ts_headline
+TS_CONFIG = 'spanish_unaccent'
+
+# ts_rank() weights, in PostgreSQL order {D, C, B, A}
+TS_WEIGHTS = '{0.1, 0.2, 0.4, 1.0}'
+
+SQLITE_INDEX_COLUMNS = """
+    id, name,
+    (SELECT group_concat(value, ' ') FROM json_each(CASE WHEN json_valid(tags) THEN tags ELSE '[]' END)),
+    summary, description,
+    (SELECT group_concat(json_extract(value, '$.instruction'), ' ')
+       FROM json_each(CASE WHEN json_valid(steps) THEN steps ELSE '[]' END) WHERE type = 'object')
+"""
+
+POSTGRES_VECTOR = f"""
+    setweight(to_tsvector('{TS_CONFIG}', COALESCE(name, '')), 'A') ||
+    setweight(to_tsvector('{TS_CONFIG}', COALESCE((
+        SELECT string_agg(t, ' ') FROM jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(tags) = 'array' THEN tags ELSE '[]'::jsonb END) AS t), '')), 'B') ||
+    setweight(to_tsvector('{TS_CONFIG}', COALESCE(summary, '')), 'C') ||
+    setweight(to_tsvector('{TS_CONFIG}', COALESCE(description, '') || ' ' || COALESCE((
+        SELECT string_agg(s->>'instruction', ' ') FROM jsonb_array_elements(
+            CASE WHEN jsonb_typeof(steps) = 'array' THEN steps ELSE '[]'::jsonb END) AS s
+        WHERE jsonb_typeof(s) = 'object'), '')), 'D')
+"""
+
+
+def search_terms(query):
+    """Split user input into lowercase word tokens (drops FTS operators)"""
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def match_expression(terms):
+    """Prefix-match every term: FTS5 MATCH string or PostgreSQL tsquery text"""
+    if settings.is_postgresql:
+        return ' & '.join(f"{t}:*" for t in terms)
+    return ' '.join(f'"{t}"*' for t in terms)
+
+
+def config_statements():
+    """PostgreSQL statements creating ``TS_CONFIG``; run once, when it does not exist yet"""
+    return [
+        "CREATE EXTENSION IF NOT EXISTS unaccent",
+        f"CREATE TEXT SEARCH CONFIGURATION {TS_CONFIG} (COPY = spanish)",
+        f"ALTER TEXT SEARCH CONFIGURATION {TS_CONFIG} "
+        "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem",
+    ]
+
+
+def schema_statements(suffix=''):
+    """CREATE statements for the index of ``exercises<suffix>`` (PostgreSQL keeps it in a column)"""
+    if settings.is_postgresql:
+        return []
+    return [f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS exercises_fts{suffix} USING fts5(
+            name, tags, summary, description, steps,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """]
+
+
+def sync_statements(subset=False, suffix=''):
+    """Statements re-indexing every exercise of ``exercises<suffix>``.
+
+    With ``subset`` only the ids bound as one ``ids_param`` parameter.
+    """
+    where = f" WHERE {any_id('id')}" if subset else ""
+    if settings.is_postgresql:
+        return [f"UPDATE exercises{suffix} SET search_vector = {POSTGRES_VECTOR}{where}"]
+    delete = f"DELETE FROM exercises_fts{suffix} WHERE {any_id('rowid')}" if subset else f"DELETE FROM exercises_fts{suffix}"
+    insert = (
+        f"INSERT INTO exercises_fts{suffix} (rowid, name, tags, summary, description, steps) "
+        f"SELECT {SQLITE_INDEX_COLUMNS} FROM exercises{suffix}{where}"
+    )
+    return [delete, insert]
+
+
+def sync_search_index(cursor, exercise_id=None):
+    """Refresh the index for one exercise (or all) in the caller's transaction"""
+    if exercise_id is None:
+        for statement in sync_statements():
+            cursor.execute(statement)
+    else:
+        sync_search_index_many(cursor, [exercise_id])
+
+
+def sync_search_index_many(cursor, exercise_ids):
+    """Refresh the index for several exercises with the same statements as for one"""
+    params = (ids_param(exercise_ids),)
+    for statement in sync_statements(subset=True):
+        cursor.execute(statement, params)
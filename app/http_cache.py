@@ -0,0 +1,100 @@
+"""Conditional GET support (ETag / Last-Modified / 304) for read endpoints.
+
+Validators are derived from the catalog snapshot (``catalog_meta`` version
+and timestamp), from one exercise's ``updated_at`` or from a file's stat, so
+a matching request is answered with an empty 304 before any query or
+serialization work. The exercise validators also back ``If-Match`` on
+``PATCH /v2/exercises/{id}``.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+# Clients may store responses but must revalidate them on every use
+CACHE_CONTROL = "no-cache"
+
+
+def catalog_validators(catalog):
+    """``(etag, modified_at)`` for responses derived from a catalog snapshot"""
+    stamp = int(catalog.modified_at.replace(tzinfo=timezone.utc).timestamp())
+    return f'"{catalog.source}-{catalog.version}-{stamp}"', catalog.modified_at
+
+
+def _timestamp(value):
+    """Naive UTC datetime from a datetime or ISO string column, or None"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def exercise_validators(exercise):
+    """``(etag, modified_at)`` of one exercise from its ``updated_at``, or None without one"""
+    modified_at = _timestamp(exercise.get('updated_at'))
+    if modified_at is None:
+        return None
+    stamp = int(modified_at.replace(tzinfo=timezone.utc).timestamp() * 1_000_000)
+    return f'"{exercise["id"]}-{stamp:x}"', modified_at
+
+
+def file_validators(path):
+    """``(etag, modified_at)`` for responses derived from a data file"""
+    stat = path.stat()
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"', datetime.utcfromtimestamp(stat.st_mtime)
+
+
+def is_not_modified(request: Request, etag, modified_at):
+    """Evaluate If-None-Match (preferred) or If-Modified-Since"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        # Weak comparison, as required for GET/HEAD
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return etag in tags
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is None or modified_at is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return modified_at.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def if_match(request: Request, etag):
+    """Evaluate If-Match: true if absent, ``*`` or listing ``etag`` (strong comparison)"""
+    header = request.headers.get('if-match')
+    if header is None or header.strip() == '*':
+        return True
+    # Weak tags never match, as required for writes
+    return etag is not None and etag in [tag.strip() for tag in header.split(',')]
+
+
+def conditional(request: Request, response: Response, validators):
+    """Set cache headers on ``response``; return a 304 response if the client copy is current.
+
+    Usage in an endpoint::
+
+        not_modified = conditional(request, response, catalog_validators(catalog))
+        if not_modified:
+            return not_modified
+    """
+    etag, modified_at = validators
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL}
+    if modified_at is not None:
+        headers['Last-Modified'] = format_datetime(modified_at.replace(tzinfo=timezone.utc), usegmt=True)
+    if is_not_modified(request, etag, modified_at):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
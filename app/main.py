@@ -17,6 +17,8 @@ from app.routers import images
 from app.routers import auth_router
 from app.config import setup_logging, settings
 from app.init_db import init_database
+from app.database import get_pool_stats
+from app.async_database import close_async_pools
 
 # Configurar logging
 setup_logging()
@@ -59,6 +61,11 @@ async def startup_event():
         logger.error(f"Error al inicializar la base de datos: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Cerrar las conexiones async del pool al detener la aplicación"""
+    await close_async_pools()
+
 # Manejadores de errores globales
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
@@ -113,7 +120,8 @@ def health_check():
         "status": "healthy", 
         "service": "GainzAPI",
         "database": db_type,
-        "database_url": settings.DATABASE_URL.split('@')[0] + '@***' if '@' in settings.DATABASE_URL else "SQLite local"
+        "database_url": settings.DATABASE_URL.split('@')[0] + '@***' if '@' in settings.DATABASE_URL else "SQLite local",
+        "db_pool": get_pool_stats()
     }
 
 # Mount static directory for development image serving
@@ -0,0 +1,250 @@
+"""SQL builders for the v2 exercise list.
+
+Filters and pagination are compiled into a single parameterized statement so
+the database only returns the requested page. Both SQLite and PostgreSQL are
+supported; the differences are the placeholder style and which full-text
+engine backs ``query`` (see app/fulltext.py). List fields are filtered
+through the normalized join tables (see app/relations.py).
+"""
+import base64
+import json
+
+from app.config import settings
+from app.database import EXERCISE_COLUMNS
+from app.facets import FACET_FIELDS, LIST_FACETS
+from app.fulltext import FTS_WEIGHTS, TS_CONFIG, TS_WEIGHTS, search_terms, match_expression
+from app.relations import relation_match
+
+# Enough to page and to check a row against the catalog snapshot (see build_rows_query)
+KEY_COLUMNS = ('id', 'name', 'updated_at')
+
+# Columns clients may sort by; each is paired with ``id`` for keyset pagination.
+# ``relevance`` is only available when searching and maps to the ``rank`` column.
+SORT_KEYS = ('id', 'name', 'relevance')
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+
+# Ordered difficulty levels (stored values are English; Spanish names are accepted)
+DIFFICULTY_LEVELS = {
+    'beginner': 1, 'principiante': 1,
+    'intermediate': 2, 'intermedio': 2,
+    'advanced': 3, 'avanzado': 3,
+}
+
+
+def placeholder():
+    return '%s' if settings.is_postgresql else '?'
+
+
+def sort_column(sort):
+    return 'rank' if sort == 'relevance' else sort
+
+
+def split_values(value):
+    """``"chest, Triceps"`` -> ``('chest', 'Triceps')``"""
+    return tuple(v.strip() for v in (value or '').split(',') if v.strip())
+
+
+def difficulty_range(minimum=None, maximum=None):
+    """Difficulty names between ``minimum`` and ``maximum`` (inclusive)"""
+    bounds = []
+    for name in (minimum, maximum):
+        if name and name.strip().lower() not in DIFFICULTY_LEVELS:
+            raise ValueError(f"Unknown difficulty: {name}. Use beginner, intermediate or advanced")
+        bounds.append(DIFFICULTY_LEVELS[name.strip().lower()] if name else None)
+    low = bounds[0] or 1
+    high = bounds[1] or max(DIFFICULTY_LEVELS.values())
+    return tuple(name for name, level in DIFFICULTY_LEVELS.items() if low <= level <= high)
+
+
+def parse_filters(muscle=None, secondary_muscle=None, equipment=None, equipment_all=None,
+                  equipment_any=None, exclude_equipment=None, difficulty=None,
+                  difficulty_min=None, difficulty_max=None):
+    """Compile the list query parameters into ``((facet, op, values), ...)``.
+
+    Comma-separated values: ``muscle``, ``secondary_muscle``, ``equipment_any``
+    and ``difficulty`` match any of them, ``equipment``/``equipment_all``
+    require all of them and ``exclude_equipment`` none of them. The result is
+    hashable (used as a cache key) and is evaluated either as SQL
+    (``build_filters``) or on the facet bitsets (``FacetIndex.select``).
+
+    Raises ValueError for unknown difficulty names.
+    """
+    filters = []
+    for facet, op, value in (
+        ('muscle', 'any', muscle),
+        ('secondary_muscle', 'any', secondary_muscle),
+        ('equipment', 'all', ','.join(v for v in (equipment, equipment_all) if v)),
+        ('equipment', 'any', equipment_any),
+        ('equipment', 'none', exclude_equipment),
+        ('difficulty', 'any', difficulty),
+    ):
+        values = split_values(value)
+        if values:
+            filters.append((facet, op, values))
+    if difficulty_min or difficulty_max:
+        filters.append(('difficulty', 'any', difficulty_range(difficulty_min, difficulty_max)))
+    return tuple(filters)
+
+
+def build_filters(filters=()):
+    """Return ``(clauses, params)`` for compiled list filters (see parse_filters)"""
+    p = placeholder()
+    clauses = []
+    params = []
+
+    for facet, op, values in filters:
+        if facet not in LIST_FACETS:
+            column = f"exercises.{FACET_FIELDS[facet]}"
+            # LOWER(column) matches the expression indexes on primary_muscle/difficulty
+            placeholders = ', '.join(f"LOWER({p})" for _ in values)
+            clause = f"LOWER({column}) IN ({placeholders})"
+            clauses.append(f"NOT COALESCE({clause}, FALSE)" if op == 'none' else clause)
+            params.extend(values)
+        elif op == 'all':
+            # List facets are matched through the join tables (see app/relations.py)
+            for value in values:
+                clauses.append(relation_match(facet, f"LOWER({p})"))
+                params.append(value)
+        else:
+            clause = relation_match(facet, ', '.join(f"LOWER({p})" for _ in values))
+            clauses.append(f"NOT {clause}" if op == 'none' else clause)
+            params.extend(values)
+    return clauses, params
+
+
+def build_source(query=None, filters=(), highlight=False, columns=EXERCISE_COLUMNS):
+    """Return ``(sql, params)`` for the filtered row set.
+
+    When ``query`` has search terms the rows come from the full-text index
+    and carry a ``rank`` column (lower is better), plus ``name_highlight`` and
+    ``snippet`` when ``highlight`` is set.
+    """
+    p = placeholder()
+    columns = ', '.join(f"exercises.{c}" for c in columns)
+    clauses, params = build_filters(filters)
+    terms = search_terms(query)
+
+    if not terms:
+        sql = f"SELECT {columns} FROM exercises"
+    elif settings.is_postgresql:
+        extra = ''
+        if highlight:
+            options = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}"
+            extra = (
+                f", ts_headline('{TS_CONFIG}', exercises.name, tsq, '{options}, HighlightAll=true') AS name_highlight"
+                f", ts_headline('{TS_CONFIG}', COALESCE(exercises.description, ''), tsq, '{options}, MaxFragments=1, MaxWords=20') AS snippet"
+            )
+        sql = (
+            f"SELECT {columns}, -ts_rank('{TS_WEIGHTS}', exercises.search_vector, tsq) AS rank{extra} "
+            f"FROM exercises, to_tsquery('{TS_CONFIG}', {p}) AS tsq"
+        )
+        clauses.insert(0, "exercises.search_vector @@ tsq")
+        params.insert(0, match_expression(terms))
+    else:
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        extra = fts_extra = ''
+        if highlight:
+            extra = (
+                f", highlight(exercises_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}') AS name_highlight"
+                f", snippet(exercises_fts, 3, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 16) AS snippet"
+            )
+            fts_extra = ', fts.name_highlight, fts.snippet'
+        sql = (
+            f"SELECT {columns}, fts.rank{fts_extra} FROM exercises JOIN ("
+            f"SELECT rowid AS fts_id, bm25(exercises_fts, {weights}) AS rank{extra} "
+            f"FROM exercises_fts WHERE exercises_fts MATCH {p}"
+            f") AS fts ON fts.fts_id = exercises.id"
+        )
+        params.insert(0, match_expression(terms))
+
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    return sql, params
+
+
+def order_by(sort):
+    column = sort_column(sort)
+    return 'id' if column == 'id' else f"{column}, id"
+
+
+def build_list_query(query=None, filters=(), sort='id', limit=50, offset=0, highlight=False, columns=EXERCISE_COLUMNS):
+    """Return ``(sql, params)`` selecting one page of exercises"""
+    p = placeholder()
+    source, params = build_source(query, filters, highlight, columns)
+    sql = f"SELECT * FROM ({source}) AS hits ORDER BY {order_by(sort)} LIMIT {p} OFFSET {p}"
+    return sql, params + [limit, offset]
+
+
+def build_keyset_query(query=None, filters=(), sort='id', after=None, limit=50, highlight=False, columns=EXERCISE_COLUMNS):
+    """Return ``(sql, params)`` for the page following ``after``.
+
+    ``after`` is the decoded cursor ``(sort_value, id)`` of the last row the
+    client has seen, or None for the first page. One extra row is fetched so
+    the caller can tell whether there is a next page.
+    """
+    p = placeholder()
+    source, params = build_source(query, filters, highlight, columns)
+    column = sort_column(sort)
+    seek = ''
+    if after is not None:
+        if column == 'id':
+            seek = f" WHERE id > {p}"
+            params.append(after[1])
+        else:
+            seek = f" WHERE ({column}, id) > ({p}, {p})"
+            params += list(after)
+    sql = f"SELECT * FROM ({source}) AS hits{seek} ORDER BY {order_by(sort)} LIMIT {p}"
+    return sql, params + [limit + 1]
+
+
+def build_id_query(query=None, filters=()):
+    """Return ``(sql, params)`` selecting just the ids of every match"""
+    source, params = build_source(query, filters, columns=('id',))
+    return f"SELECT id FROM ({source}) AS hits", params
+
+
+def build_count_query(query=None, filters=()):
+    source, params = build_source(query, filters, columns=('id',))
+    return f"SELECT COUNT(*) AS count FROM ({source}) AS hits", params
+
+
+def build_rows_query(ids):
+    """Return ``(sql, params)`` selecting the full rows of ``ids``"""
+    p = placeholder()
+    return f"SELECT {', '.join(EXERCISE_COLUMNS)} FROM exercises WHERE id IN ({', '.join(p for _ in ids)})", list(ids)
+
+
+# JSON type of the sort value carried by a cursor for each sort key
+CURSOR_VALUE_TYPES = {'id': (int,), 'name': (str,), 'relevance': (int, float)}
+
+
+def _is_cursor_value(value, types):
+    return isinstance(value, types) and not isinstance(value, bool)
+
+
+def encode_cursor(sort, value, last_id):
+    """Opaque cursor pointing just after the row with ``(value, last_id)``"""
+    payload = json.dumps([sort, value, last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Return ``(sort_value, id)`` or None for an empty cursor.
+
+    Raises ValueError if the cursor is malformed, was issued for another
+    sort or carries a value of the wrong type for it.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or sort not in CURSOR_VALUE_TYPES:
+        raise ValueError("Cursor does not match the requested sort")
+    if not _is_cursor_value(value, CURSOR_VALUE_TYPES[sort]) or not _is_cursor_value(last_id, (int,)):
+        raise ValueError("Invalid cursor")
+    return value, last_id
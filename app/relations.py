@@ -0,0 +1,143 @@
+"""Normalized relations for the v2 list fields (secondary muscles, equipment, tags).
+
+The JSON columns stay the source of the API bodies; alongside them every
+distinct value gets an integer code in the ``terms`` vocabulary
+(``(kind, value)`` unique, value lowercased) and one join table per field
+links codes to exercises, keyed ``(term_id, exercise_id)`` with a second
+index on ``exercise_id``. A list filter is then a unique-index lookup of
+the codes plus a primary-key range scan, instead of decoding JSON for every
+row.
+
+Like the full-text index, the relations are maintained explicitly: every
+v2 write calls ``sync_relations`` inside its own transaction.
+"""
+from app.config import settings
+from app.sql import any_id, ids_param
+
+# List facet -> join table
+RELATION_TABLES = {
+    'secondary_muscle': 'exercise_secondary_muscles',
+    'equipment': 'exercise_equipment',
+    'tag': 'exercise_tags',
+}
+
+# List facet -> exercises column
+RELATION_COLUMNS = {
+    'secondary_muscle': 'secondary_muscles',
+    'equipment': 'equipment',
+    'tag': 'tags',
+}
+
+
+# Join table -> its exercise_id index
+RELATION_INDEXES = {table: f"idx_{table}_exercise" for table in RELATION_TABLES.values()}
+
+
+def schema_statements():
+    """CREATE statements for the vocabulary and the join tables"""
+    if settings.is_postgresql:
+        terms = """
+            CREATE TABLE IF NOT EXISTS terms (
+                id SERIAL PRIMARY KEY,
+                kind VARCHAR(50) NOT NULL,
+                value VARCHAR(255) NOT NULL,
+                UNIQUE (kind, value)
+            )
+        """
+    else:
+        terms = """
+            CREATE TABLE IF NOT EXISTS terms (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                UNIQUE (kind, value)
+            )
+        """
+    return [terms] + table_statements() + index_statements()
+
+
+def table_statements(suffix=''):
+    """CREATE statements for the join tables, named ``<table><suffix>``"""
+    without_rowid = "" if settings.is_postgresql else " WITHOUT ROWID"
+    return [
+        f"""
+            CREATE TABLE IF NOT EXISTS {table}{suffix} (
+                term_id INTEGER NOT NULL,
+                exercise_id INTEGER NOT NULL,
+                PRIMARY KEY (term_id, exercise_id)
+            ){without_rowid}
+        """
+        for table in RELATION_TABLES.values()
+    ]
+
+
+def index_statements(suffix=''):
+    """CREATE INDEX statements for the join tables, index and table names ending in ``suffix``"""
+    return [
+        f"CREATE INDEX IF NOT EXISTS {name}{suffix} ON {table}{suffix} (exercise_id)"
+        for table, name in RELATION_INDEXES.items()
+    ]
+
+
+def _elements(column):
+    """FROM item expanding a JSON array column into ``j.value`` rows"""
+    if settings.is_postgresql:
+        return (
+            f"jsonb_array_elements_text(CASE WHEN jsonb_typeof(exercises.{column}) = 'array' "
+            f"THEN exercises.{column} ELSE '[]'::jsonb END) AS j(value)"
+        )
+    return f"json_each(CASE WHEN json_valid(exercises.{column}) THEN exercises.{column} ELSE '[]' END) AS j"
+
+
+def sync_statements(subset=False, suffix=''):
+    """Statements rebuilding every relation, or with ``subset`` those of the
+    ids bound as one ``ids_param`` parameter.
+
+    With ``suffix`` they read ``exercises<suffix>`` and write the join
+    tables with that suffix (a shadow catalog); ``terms`` is shared.
+    """
+    only = f" AND {any_id('exercises.id')}" if subset else ""
+    if settings.is_postgresql:
+        insert, conflict = "INSERT INTO", " ON CONFLICT DO NOTHING"
+        is_text = ""
+    else:
+        insert, conflict = "INSERT OR IGNORE INTO", ""
+        is_text = " AND j.type = 'text'"
+
+    statements = []
+    for facet, table in RELATION_TABLES.items():
+        elements = _elements(RELATION_COLUMNS[facet])
+        statements += [
+            f"DELETE FROM {table}{suffix} WHERE {any_id('exercise_id')}" if subset else f"DELETE FROM {table}{suffix}",
+            f"{insert} terms (kind, value) "
+            f"SELECT DISTINCT '{facet}', LOWER(TRIM(j.value)) FROM exercises{suffix} AS exercises, {elements} "
+            f"WHERE TRIM(j.value) != ''{is_text}{only}{conflict}",
+            f"{insert} {table}{suffix} (term_id, exercise_id) "
+            f"SELECT DISTINCT terms.id, exercises.id FROM exercises{suffix} AS exercises, {elements}, terms "
+            f"WHERE terms.kind = '{facet}' AND terms.value = LOWER(TRIM(j.value)){is_text}{only}{conflict}",
+        ]
+    return statements
+
+
+def sync_relations(cursor, exercise_id=None):
+    """Refresh the relations of one exercise (or all) in the caller's transaction"""
+    if exercise_id is None:
+        for statement in sync_statements():
+            cursor.execute(statement)
+    else:
+        sync_relations_many(cursor, [exercise_id])
+
+
+def sync_relations_many(cursor, exercise_ids):
+    """Refresh the relations of several exercises with the same statements as for one"""
+    params = (ids_param(exercise_ids),)
+    for statement in sync_statements(subset=True):
+        cursor.execute(statement, params)
+
+
+def relation_match(facet, placeholders):
+    """SQL condition: the exercise has any of ``placeholders`` in list facet ``facet``"""
+    return (
+        f"exercises.id IN (SELECT r.exercise_id FROM terms JOIN {RELATION_TABLES[facet]} AS r "
+        f"ON r.term_id = terms.id WHERE terms.kind = '{facet}' AND terms.value IN ({placeholders}))"
+    )
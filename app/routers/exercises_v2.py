@@ -1,11 +1,25 @@
-from fastapi import APIRouter, HTTPException, Query, Depends, Header
-from pydantic import BaseModel, Field, HttpUrl
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Depends, Header, Request, Response, Body
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl, TypeAdapter, ValidationError
+from typing import List, Optional, Dict, Any, Union
 import json
+import sqlite3
+import psycopg2
 from pathlib import Path
 from datetime import datetime
 from app.auth import verify_token
-from app.database import get_db_connection, init_database, get_exercise_count
+from app.database import get_db_connection, init_database, get_exercise_count, bump_catalog_version, EXERCISE_COLUMNS
+from app.async_database import fetch_all
+from app.catalog import get_catalog_async, invalidate_catalog, iter_exercise_rows, transform, decode_exercise_row
+from app.search import fold, PrefixIndex
+from app.fulltext import INDEXED_COLUMNS, sync_search_index, sync_search_index_many, search_terms
+from app.relations import RELATION_COLUMNS, sync_relations, sync_relations_many
+from app.catalog_swap import SHADOW, SHADOW_TABLE, create_shadow, validate_shadow, prepare_shadow, swap_in, drop_retired, rollback
+from app.bulk_load import LOAD_COLUMNS, BATCH_SIZE, bulk_insert, upsert_batch, slug_ids, convert, iter_json_array, normalize_items, row_from_item, row_from_v1
+from app.changes import DELETE, record_change, record_changes, record_reset, changes_query, fold_changes
+from app.queries import SORT_KEYS, placeholder, KEY_COLUMNS, parse_filters, split_values, sort_column, build_list_query, build_keyset_query, build_count_query, build_id_query, build_rows_query, encode_cursor, decode_cursor
+from app.serialization import dumps, json_array, json_response, accepts_gzip, gzip_stream
+from app.http_cache import conditional, if_match, catalog_validators, exercise_validators, file_validators
 from app.config import settings
 import logging
 
@@ -62,94 +76,85 @@ class ExerciseV2(BaseModel):
     updated_at: Optional[datetime] = None
 
 
-def load_exercises_raw():
-    """Load exercises from database or fallback to JSON file"""
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            if settings.is_production:
-                # PostgreSQL query
-                cursor.execute('SELECT * FROM exercises ORDER BY id')
-            else:
-                # SQLite query - try to get from exercises table first
-                cursor.execute('SELECT * FROM exercises ORDER BY id')
-            
-            rows = cursor.fetchall()
-            if rows:
-                exercises = []
-                for row in rows:
-                    # Convert row to dict and handle JSON fields
-                    exercise = dict(row)
-                    
-                    # Parse JSON fields for both PostgreSQL and SQLite
-                    json_fields = ['secondary_muscles', 'equipment', 'steps', 'tips', 'images', 'tags', 'variations']
-                    for field in json_fields:
-                        if field in exercise and exercise[field]:
-                            if isinstance(exercise[field], str):
-                                try:
-                                    exercise[field] = json.loads(exercise[field])
-                                except json.JSONDecodeError:
-                                    exercise[field] = []
-                    
-                    # Handle estimated field
-                    if 'estimated' in exercise and exercise['estimated']:
-                        if isinstance(exercise['estimated'], str):
-                            try:
-                                exercise['estimated'] = json.loads(exercise['estimated'])
-                            except json.JSONDecodeError:
-                                exercise['estimated'] = None
-                    
-                    exercises.append(exercise)
-                
-                logger.info(f"Loaded {len(exercises)} exercises from database")
-                return exercises
-            else:
-                logger.warning("No exercises found in database, loading from JSON file")
-                
-    except Exception as e:
-        logger.error(f"Error loading exercises from database: {e}")
-        logger.info("Falling back to JSON file")
-    
-    # Fallback to JSON file
-    try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            logger.info(f"Loaded {len(data)} exercises from JSON file")
-            return data
-    except Exception as e:
-        logger.error(f"Error loading exercises from JSON file: {e}")
-        return []
+class ExerciseReadV2(ExerciseV2):
+    """An exercise as the read endpoints return it; never accepted as input"""
+    highlight: Optional[Dict[str, Optional[str]]] = Field(None, description="Search matches wrapped in <mark> (only with highlight=true)")
+
+
+class ExerciseCardV2(BaseModel):
+    """Slim projection for list screens (``view=card``)"""
+    id: Optional[int] = None
+    slug: str
+    name: str
+    primary_muscle: Optional[str]
+    difficulty: Optional[str]
+    equipment: List[str] = []
+    thumbnail: Optional[str] = Field(None, description="URL of the first image")
+    highlight: Optional[Dict[str, Optional[str]]] = None
+
+
+# Fields selectable with ``fields=`` (``id`` is always included)
+PROJECTABLE_FIELDS = tuple(ExerciseV2.model_fields)
+VIEWS = ('full', 'card')
+
+MAX_BATCH_SIZE = 100
+
+# Rows fetched per round trip by /export
+EXPORT_BATCH_SIZE = 500
+
+# Items accepted by POST /bulk, written BATCH_SIZE per transaction
+MAX_BULK_SIZE = 5000
+
+# Fields PATCH may change (stored columns except the timestamps), with their validators
+PATCHABLE_FIELDS = tuple(c for c in LOAD_COLUMNS if c not in ('created_at', 'updated_at'))
+FIELD_ADAPTERS = {f: TypeAdapter(ExerciseV2.model_fields[f].annotation) for f in PATCHABLE_FIELDS}
 
+# List columns stored as plain JSON arrays
+LIST_COLUMNS = ('secondary_muscles', 'equipment', 'tips', 'tags', 'variations')
 
-def slugify(name: str) -> str:
-    return name.lower().replace(' ', '-').replace("\u00f3", "o").replace("\u00e1", "a").replace("\u00e9", "e").replace("\u00ed", "i").replace("\u00fa", "u")
-
-
-def transform(old):
-    now = datetime.utcnow().isoformat()
-    steps = []
-    if old.get('instructions'):
-        steps = [{"order": 1, "instruction": old['instructions']}]
-    return {
-        "id": old.get('id'),
-        "slug": slugify(old.get('name', '')),
-        "name": old.get('name'),
-        "summary": (old.get('instructions') or '')[:120],
-        "description": old.get('instructions'),
-        "primary_muscle": old.get('muscle'),
-        "secondary_muscles": [],
-        "equipment": [old.get('equipment')] if old.get('equipment') else [],
-        "difficulty": old.get('difficulty'),
-        "steps": steps,
-        "tips": [],
-        "images": [],
-        "video_url": None,
-        "tags": [],
-        "variations": [],
-        "estimated": None,
-        "created_at": now,
-        "updated_at": now
-    }
+# Columns stored as JSON text (JSONB on PostgreSQL)
+JSON_COLUMNS = LIST_COLUMNS + ('steps', 'images', 'estimated')
+
+
+class ExerciseBatchV2(BaseModel):
+    items: List[Union[ExerciseReadV2, ExerciseCardV2, Dict[str, Any]]]
+    missing_ids: List[int] = []
+    missing_slugs: List[str] = []
+
+
+class ExerciseChangesV2(BaseModel):
+    version: int = Field(..., description="Catalog version of this response; send it as `since` next time")
+    reset: bool = Field(..., description="True if the client must replace its copy with `upserts`")
+    upserts: List[Union[ExerciseReadV2, ExerciseCardV2, Dict[str, Any]]]
+    deletes: List[int] = []
+
+
+class ExerciseBulkItemV2(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    slug: Optional[str] = None
+    id: Optional[int] = None
+    status: str = Field(..., description="created, updated or error")
+    detail: Optional[str] = None
+
+
+class ExerciseBulkResultV2(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    items: List[ExerciseBulkItemV2]
+
+
+class ExerciseSuggestionV2(BaseModel):
+    id: int
+    slug: str
+    name: str
+
+
+class ExercisePageV2(BaseModel):
+    items: List[Union[ExerciseReadV2, ExerciseCardV2, Dict[str, Any]]]
+    next_cursor: Optional[str] = None
+    total: int
+    facets: Optional[Dict[str, Dict[str, int]]] = Field(None, description="Result counts per muscle, secondary muscle, equipment, difficulty and tag")
 
 
 def require_auth(auth=Depends(verify_token)):
@@ -158,70 +163,451 @@ def require_auth(auth=Depends(verify_token)):
     return auth
 
 
-@router.get("/", response_model=List[ExerciseV2])
-def get_exercises_v2(query: Optional[str] = Query(None), muscle: Optional[str] = None, equipment: Optional[str] = None, page: int = 1, limit: int = 50):
-    raw = load_exercises_raw()
-    transformed = [transform(e) for e in raw]
-    if query:
-        q = query.lower()
-        transformed = [e for e in transformed if q in (e['name'] or '').lower() or q in (e.get('description') or '').lower()]
-    if muscle:
-        transformed = [e for e in transformed if e.get('primary_muscle') and e['primary_muscle'].lower() == muscle.lower()]
-    if equipment:
-        transformed = [e for e in transformed if equipment.lower() in [x.lower() for x in e.get('equipment', [])]]
-    start = (page - 1) * limit
-    end = start + limit
-    return transformed[start:end]
+async def search_bits(catalog, query, fuzzy, similarity):
+    """Facet bits of the exercises matching ``query`` alone (None when not searching).
+
+    Fuzzy matches come from the trigram index; otherwise the full-text
+    index is asked for the matching ids (or, on the JSON fallback, names and
+    descriptions are scanned). Results are memoized per snapshot.
+    """
+    facets = catalog.facet_index
+    if fuzzy:
+        hits = catalog.memoize(('fuzzy', query, similarity), lambda: catalog.text_index.search(query, similarity))
+        return facets.bits_of_ids(exercise_id for exercise_id, _ in hits)
+    if not search_terms(query):
+        return None
+    if catalog.source != "database":
+        q = fold(query)
+        return facets.bits_of_ids(
+            e['id'] for e in catalog.exercises if q in fold(e['name']) or q in fold(e.get('description'))
+        )
+
+    async def ids():
+        sql, params = build_id_query(query)
+        return facets.bits_of_ids(row['id'] for row in await fetch_all(sql, params))
+    return await catalog.memoize_async(('ids', query), ids)
+
+
+async def match_in_memory(catalog, query, filters, sort, fuzzy, similarity):
+    """Return ``[(sort_value, id, exercise)]`` in list order from the snapshot.
+
+    Used for fuzzy matching (trigram index) and when the database is empty
+    and the catalog comes from the JSON fallback. Structured filters are
+    bitset intersections on the facet index.
+    """
+    facets = catalog.facet_index
+    bits = facets.select(filters, await search_bits(catalog, query, fuzzy, similarity))
+    exercises = [catalog.get(exercise_id) for exercise_id in facets.ids_of(bits)]
+
+    if sort == 'relevance':
+        # Without fuzzy scores (JSON fallback) relevance is plain id order
+        ranks = {}
+        if fuzzy:
+            hits = catalog.memoize(('fuzzy', query, similarity), lambda: catalog.text_index.search(query, similarity))
+            ranks = {exercise_id: -score for exercise_id, score in hits}
+        matched = [(ranks.get(e['id'], e['id']), e['id'], e) for e in exercises]
+    else:
+        matched = [(e[sort], e['id'], e) for e in exercises]
+    matched.sort(key=lambda m: m[:2])
+    return matched
+
+
+def row_to_item(row):
+    """Transform a list/search row, moving highlight columns under ``highlight``"""
+    exercise = transform(decode_exercise_row(row))
+    exercise.pop('rank', None)
+    if 'name_highlight' in exercise:
+        exercise['highlight'] = {
+            'name': exercise.pop('name_highlight'),
+            'snippet': exercise.pop('snippet'),
+        }
+    return exercise
+
+
+async def resolve_rows(catalog, rows, column):
+    """``[(sort_value, exercise)]`` for key-only list rows (see queries.KEY_COLUMNS).
+
+    Rows whose ``updated_at`` matches the snapshot use the snapshot copy;
+    the rest (written since the snapshot was built) are read in full.
+    """
+    exercises = {}
+    stale = []
+    for row in rows:
+        cached = catalog.get(row['id'])
+        if cached is not None and cached['updated_at'] == row['updated_at']:
+            exercises[row['id']] = cached
+        else:
+            stale.append(row['id'])
+    if stale:
+        sql, params = build_rows_query(stale)
+        for row in await fetch_all(sql, params):
+            exercises[row['id']] = row_to_item(row)
+    # A stale row deleted in between is simply skipped
+    return [(row[column], exercises[row['id']]) for row in rows if row['id'] in exercises]
+
+
+def parse_fields(fields):
+    """``"name,images"`` -> ``('id', 'name', 'images')`` in model order; ValueError if unknown"""
+    requested = {f.strip() for f in fields.split(',') if f.strip()}
+    unknown = requested.difference(PROJECTABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(f for f in PROJECTABLE_FIELDS if f in requested or f == 'id')
+
+
+def dump_exercise(exercise):
+    """Validate one exercise and dump it exactly as ``response_model`` would"""
+    return ExerciseReadV2.model_validate(exercise).model_dump(mode='json')
+
+
+def project(dump, view='full', fields=None):
+    """Apply ``fields`` or a named view to a dumped exercise"""
+    if fields:
+        out = {f: dump[f] for f in fields}
+    elif view == 'card':
+        out = {f: dump[f] for f in ('id', 'slug', 'name', 'primary_muscle', 'difficulty', 'equipment')}
+        out['thumbnail'] = dump['images'][0]['url'] if dump['images'] else None
+    else:
+        return dump
+    if dump.get('highlight') is not None:
+        out['highlight'] = dump['highlight']
+    return out
+
+
+def encode_item(catalog, exercise, view='full', fields=None):
+    """JSON bytes for a list item.
+
+    Items identical to the snapshot copy (every in-memory match, and SQL rows
+    unless a write landed since the snapshot was built) reuse the snapshot's
+    validated dump and pre-encoded views; only highlighted or newer rows are
+    validated here.
+    """
+    cached = catalog.get(exercise['id'])
+    if cached is exercise or 'highlight' not in exercise and cached == exercise:
+        dump = lambda e: catalog.derived(e['id'], 'dump', dump_exercise)
+        if fields:
+            return dumps(project(dump(exercise), fields=fields))
+        return catalog.derived(exercise['id'], view, lambda e: dumps(project(dump(e), view)))
+    return dumps(project(dump_exercise(exercise), view, fields))
+
+
+@router.get("/", response_model=Union[List[ExerciseReadV2], List[ExerciseCardV2], ExercisePageV2])
+async def get_exercises_v2(
+    request: Request,
+    response: Response,
+    query: Optional[str] = Query(None),
+    muscle: Optional[str] = Query(None, description="Primary muscle; comma-separated values match any"),
+    equipment: Optional[str] = Query(None, description="Comma-separated equipment, all required (same as equipment_all)"),
+    equipment_all: Optional[str] = Query(None, description="Comma-separated equipment, all required"),
+    equipment_any: Optional[str] = Query(None, description="Comma-separated equipment, at least one required"),
+    exclude_equipment: Optional[str] = Query(None, description="Comma-separated equipment that must not be used"),
+    secondary_muscle: Optional[str] = Query(None, description="Secondary muscle; comma-separated values match any"),
+    difficulty: Optional[str] = Query(None, description="Comma-separated difficulty levels, any"),
+    difficulty_min: Optional[str] = Query(None, description="Easiest level: beginner, intermediate or advanced"),
+    difficulty_max: Optional[str] = Query(None, description="Hardest level: beginner, intermediate or advanced"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1),
+    sort: Optional[str] = Query(None, pattern='^(' + '|'.join(SORT_KEYS) + ')$', description="Defaults to relevance when searching, id otherwise"),
+    cursor: Optional[str] = Query(None, description="Keyset pagination: send an empty cursor for the first page, then the returned next_cursor"),
+    highlight: bool = Query(False, description="Include <mark>-highlighted name and snippet for search matches"),
+    match: str = Query('auto', pattern='^(auto|exact|fuzzy)$', description="exact: full-text only; fuzzy: typo-tolerant name match; auto: full-text, fuzzy if nothing matches"),
+    similarity: float = Query(0.5, ge=0.1, le=1.0, description="Minimum per-word trigram similarity for fuzzy matching"),
+    facets: bool = Query(False, description="Return {items, total, facets} with result counts per facet value"),
+    view: str = Query('full', pattern='^(' + '|'.join(VIEWS) + ')$', description="card: id, slug, name, primary_muscle, difficulty, equipment and thumbnail"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (id is always included); overrides view"),
+):
+    """List exercises.
+
+    ``query`` is answered by the full-text index (name > tags > summary >
+    description/steps) and results are ranked by relevance. Matching ignores
+    accents; with ``match=fuzzy`` (or ``auto`` when the full-text search finds
+    nothing) names are matched through an in-memory trigram index, so
+    "sentadila bulgara" still finds "Sentadilla Búlgara".
+
+    Without ``cursor`` this returns a plain list paged with ``page``/``limit``.
+    With ``cursor`` it returns ``{items, next_cursor, total}`` and seeks on
+    ``(sort, id)``, so every page costs the same regardless of depth and
+    inserts made while scrolling never shift rows between pages.
+
+    Structured filters combine with AND, so "chest or triceps, with dumbbells
+    and bench, not advanced" is one request:
+    ``muscle=chest,triceps&equipment_all=dumbbells,bench&difficulty_max=intermediate``.
+    They compile into the WHERE clause of the single list query (or a few
+    bitset operations on the facet index for in-memory matching).
+
+    ``view=card`` returns a slim shape for list screens (no steps, tips,
+    variations or image arrays) and ``fields=name,images`` any subset of the
+    exercise fields; projections of unchanged rows are encoded once per
+    catalog version.
+
+    ``facets=true`` also returns the envelope, with counts per muscle,
+    equipment, difficulty and tag for the current result set. Each facet's
+    counts ignore its own filter, so picking another value can be previewed.
+    """
+    searching = bool(search_terms(query))
+    if sort is None:
+        sort = 'relevance' if searching else 'id'
+    elif sort == 'relevance' and not searching:
+        raise HTTPException(status_code=400, detail="sort=relevance requires a search query")
+
+    try:
+        projection = parse_fields(fields) if fields else None
+        filters = parse_filters(
+            muscle, secondary_muscle, equipment, equipment_all, equipment_any,
+            exclude_equipment, difficulty, difficulty_min, difficulty_max,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    catalog = await get_catalog_async()
+    not_modified = conditional(request, response, catalog_validators(catalog))
+    if not_modified:
+        return not_modified
+
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor, sort)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        count_sql, count_params = build_count_query(query, filters)
+        async def count_rows():
+            return (await fetch_all(count_sql, count_params))[0]['count']
+        count = lambda: catalog.memoize_async(('count', query, filters), count_rows)
+
+        fuzzy = searching and (
+            match == 'fuzzy'
+            or match == 'auto' and catalog.source == "database" and await count() == 0
+        )
+        envelope = cursor is not None or facets
+
+        if fuzzy or catalog.source != "database":
+            matched = await match_in_memory(catalog, query, filters, sort, fuzzy, similarity)
+            total = len(matched)
+            if cursor is None:
+                start = (page - 1) * limit
+                rows = [(value, e) for value, _, e in matched[start:start + limit]]
+            else:
+                if after is not None:
+                    matched = [m for m in matched if m[:2] > tuple(after)]
+                rows = [(value, e) for value, _, e in matched[:limit + 1]]
+        else:
+            column = sort_column(sort)
+            # Highlights are per query; otherwise only keys are read and rows come from the snapshot
+            columns = EXERCISE_COLUMNS if highlight else KEY_COLUMNS
+            if cursor is None:
+                sql, params = build_list_query(query, filters, sort=sort, limit=limit, offset=(page - 1) * limit, highlight=highlight, columns=columns)
+            else:
+                sql, params = build_keyset_query(query, filters, sort=sort, after=after, limit=limit, highlight=highlight, columns=columns)
+            fetched = await fetch_all(sql, params)
+            if highlight:
+                rows = [(row[column], row_to_item(row)) for row in fetched]
+            else:
+                rows = await resolve_rows(catalog, fetched, column)
+            total = await count() if envelope else None
+
+        if not envelope:
+            return json_response(json_array([encode_item(catalog, e, view, projection) for _, e in rows]), response)
+
+        facet_counts = None
+        if facets:
+            facet_counts = catalog.facet_index.counts(filters, await search_bits(catalog, query, fuzzy, similarity))
+    except Exception as e:
+        logger.error(f"Error listing exercises: {e}")
+        raise HTTPException(status_code=500, detail=f"Error listing exercises: {str(e)}")
+
+    items = json_array([encode_item(catalog, e, view, projection) for _, e in rows[:limit]])
+    next_cursor = None
+    if cursor is not None and len(rows) > limit:
+        value, last = rows[limit - 1]
+        next_cursor = encode_cursor(sort, value, last['id'])
+    # Splice the encoded items in front of the remaining envelope fields
+    rest = dumps({"next_cursor": next_cursor, "total": total, "facets": facet_counts})
+    return json_response(b'{"items":' + items + b',' + rest[1:], response)
 
 @router.get("/stats")
-def get_database_stats():
-    """Get database statistics and health info"""
+async def get_database_stats(request: Request, response: Response):
+    """Get database statistics and health info.
+
+    The aggregates are materialized with each catalog snapshot, so this is
+    a dict merge; ``version`` and ``generated_at`` identify the snapshot.
+    """
     try:
-        total_count = get_exercise_count()
-        
-        # Get muscle group counts
-        exercises = load_exercises_raw()
-        muscle_counts = {}
-        difficulty_counts = {}
-        equipment_counts = {}
-        
-        for exercise in exercises:
-            # Count by muscle group
-            muscle = exercise.get('primary_muscle', 'Unknown')
-            muscle_counts[muscle] = muscle_counts.get(muscle, 0) + 1
-            
-            # Count by difficulty
-            diff = exercise.get('difficulty', 'Unknown')
-            difficulty_counts[diff] = difficulty_counts.get(diff, 0) + 1
-            
-            # Count by equipment
-            for equip in exercise.get('equipment', []):
-                equipment_counts[equip] = equipment_counts.get(equip, 0) + 1
-        
+        catalog = await get_catalog_async()
+        not_modified = conditional(request, response, catalog_validators(catalog))
+        if not_modified:
+            return not_modified
         return {
-            "total_exercises": total_count,
+            **catalog.stats,
             "database_type": "PostgreSQL" if settings.is_production else "SQLite",
             "environment": settings.ENVIRONMENT,
-            "muscle_groups": muscle_counts,
-            "difficulty_levels": difficulty_counts,
-            "equipment_types": equipment_counts
         }
         
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting database stats: {str(e)}")
 
-@router.get("/{exercise_id}", response_model=ExerciseV2)
-def get_exercise_v2(exercise_id: int):
-    raw = load_exercises_raw()
-    for e in raw:
-        if e.get('id') == exercise_id:
-            return transform(e)
-    raise HTTPException(status_code=404, detail="Exercise not found in v2")
+@router.get("/suggest", response_model=List[ExerciseSuggestionV2])
+async def suggest_exercises_v2(
+    request: Request,
+    response: Response,
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=PrefixIndex.MAX_SUGGESTIONS),
+):
+    """Typeahead suggestions for the search box.
 
+    Matches the start of any word of the name, or a tag, ignoring accents
+    ("bul" -> "Sentadilla Búlgara"). Answered from the in-memory prefix
+    index without touching the database.
+    """
+    catalog = await get_catalog_async()
+    not_modified = conditional(request, response, catalog_validators(catalog))
+    if not_modified:
+        return not_modified
+    out = []
+    for exercise_id in catalog.prefix_index.suggest(prefix, limit):
+        exercise = catalog.get(exercise_id)
+        out.append({"id": exercise_id, "slug": exercise['slug'], "name": exercise['name']})
+    return out
+
+@router.get("/batch", response_model=ExerciseBatchV2)
+async def get_exercises_batch_v2(
+    request: Request,
+    response: Response,
+    ids: Optional[str] = Query(None, description="Comma-separated exercise ids"),
+    slugs: Optional[str] = Query(None, description="Comma-separated exercise slugs"),
+    view: str = Query('full', pattern='^(' + '|'.join(VIEWS) + ')$'),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (id is always included)"),
+):
+    """Fetch several exercises in one call (e.g. every exercise of a routine).
+
+    Items come back in request order, ids first and then slugs, each exercise
+    once. Ids and slugs not in the catalog are listed in ``missing_ids`` and
+    ``missing_slugs``. Lookups go through the catalog indexes, no query.
+    """
+    try:
+        id_list = [int(v) for v in split_values(ids)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    slug_list = list(split_values(slugs))
+    if not id_list and not slug_list:
+        raise HTTPException(status_code=400, detail="Provide ids and/or slugs")
+    if len(id_list) + len(slug_list) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} ids and slugs per request")
+    try:
+        projection = parse_fields(fields) if fields else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    catalog = await get_catalog_async()
+    not_modified = conditional(request, response, catalog_validators(catalog))
+    if not_modified:
+        return not_modified
+
+    found = {}
+    missing_ids = [i for i in id_list if catalog.get(i) is None]
+    missing_slugs = [slug for slug in slug_list if catalog.get_by_slug(slug) is None]
+    for exercise in [catalog.get(i) for i in id_list] + [catalog.get_by_slug(slug) for slug in slug_list]:
+        if exercise is not None and exercise['id'] not in found:
+            found[exercise['id']] = encode_item(catalog, exercise, view, projection)
+
+    rest = dumps({"missing_ids": missing_ids, "missing_slugs": missing_slugs})
+    return json_response(b'{"items":' + json_array(found.values()) + b',' + rest[1:], response)
+
+@router.get("/changes", response_model=ExerciseChangesV2)
+async def get_changes_v2(
+    request: Request,
+    response: Response,
+    since: int = Query(..., ge=0, description="`version` from the previous sync (0 for a full download)"),
+    view: str = Query('full', pattern='^(' + '|'.join(VIEWS) + ')$'),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (id is always included)"),
+):
+    """Delta sync for offline clients.
+
+    Returns the exercises created or updated since catalog version
+    ``since`` (``upserts``) and the ids deleted since then (``deletes``).
+    When the change log cannot answer (bulk migration, expired tombstones,
+    unknown version) ``reset`` is true and ``upserts`` is the whole catalog.
+    """
+    try:
+        projection = parse_fields(fields) if fields else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    catalog = await get_catalog_async()
+    not_modified = conditional(request, response, catalog_validators(catalog))
+    if not_modified:
+        return not_modified
+
+    async def changes():
+        if since > catalog.version:
+            return True, {}
+        rows = await fetch_all(*changes_query(since, catalog.version))
+        return fold_changes(since, catalog.version, rows)
+
+    try:
+        reset, ops = await changes() if catalog.source == "database" else (True, {})
+    except Exception as e:
+        logger.error(f"Error reading changes: {e}")
+        raise HTTPException(status_code=500, detail=f"Error reading changes: {str(e)}")
+
+    if reset:
+        upserts, deletes = list(catalog.exercises), []
+    else:
+        upserts, deletes = [], []
+        for exercise_id, op in ops.items():
+            exercise = catalog.get(exercise_id)
+            if op == DELETE or exercise is None:
+                deletes.append(exercise_id)
+            else:
+                upserts.append(exercise)
+
+    items = json_array([encode_item(catalog, e, view, projection) for e in upserts])
+    head = dumps({"version": catalog.version, "reset": reset})
+    tail = dumps({"deletes": deletes})
+    return json_response(head[:-1] + b',"upserts":' + items + b',' + tail[1:], response)
+
+@router.get("/export")
+def export_exercises_v2(
+    request: Request,
+    view: str = Query('full', pattern='^(' + '|'.join(VIEWS) + ')$'),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (id is always included)"),
+):
+    """Stream the whole catalog as NDJSON (one exercise per line, id order).
+
+    Rows are read from the database in batches of ``EXPORT_BATCH_SIZE``
+    and written as they are encoded, so memory stays flat and the first
+    bytes go out immediately. Gzip is applied when the client sends
+    ``Accept-Encoding: gzip``.
+    """
+    try:
+        projection = parse_fields(fields) if fields else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def lines():
+        try:
+            for rows in iter_exercise_rows(EXPORT_BATCH_SIZE):
+                yield b''.join(
+                    dumps(project(dump_exercise(transform(decode_exercise_row(row))), view, projection)) + b'\n'
+                    for row in rows
+                )
+        except Exception as e:
+            # Headers are already sent; the client sees a truncated stream
+            logger.error(f"Error exporting exercises: {e}")
+            raise
+
+    headers = {'Content-Disposition': 'attachment; filename="exercises.ndjson"', 'Vary': 'Accept-Encoding'}
+    body = lines()
+    if accepts_gzip(request):
+        headers['Content-Encoding'] = 'gzip'
+        body = gzip_stream(body)
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
 
 @router.get('/images')
-def get_images_map():
+def get_images_map(request: Request, response: Response):
     """Devuelve la lista mapeada de imágenes a ejercicios para consumo de la app.
 
     Lee `data/images_exercise_map.json` si existe; si no, intenta generar un
@@ -231,6 +617,9 @@ def get_images_map():
         base = Path(__file__).resolve().parent.parent.parent / 'data'
         map_file = base / 'images_exercise_map.json'
         if map_file.exists():
+            not_modified = conditional(request, response, file_validators(map_file))
+            if not_modified:
+                return not_modified
             with open(map_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             # return a compact mapping
@@ -245,6 +634,9 @@ def get_images_map():
         # fallback: return images_list.json
         list_file = base / 'images_list.json'
         if list_file.exists():
+            not_modified = conditional(request, response, file_validators(list_file))
+            if not_modified:
+                return not_modified
             with open(list_file, 'r', encoding='utf-8') as f:
                 imgs = json.load(f)
             return [{'image': i, 'filename': Path(i).stem} for i in imgs]
@@ -253,6 +645,36 @@ def get_images_map():
         logger.error(f"Error reading images map: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/by-slug/{slug}", response_model=ExerciseReadV2)
+async def get_exercise_by_slug_v2(slug: str, request: Request, response: Response):
+    """Get an exercise by its slug (deep links).
+
+    Resolved through the snapshot's slug index, so latency does not depend
+    on catalog size. Non-canonical spellings ("Press-Banca") also resolve.
+    """
+    catalog = await get_catalog_async()
+    exercise = catalog.get_by_slug(slug)
+    if exercise is not None:
+        # Per-exercise validators: unrelated writes do not invalidate client copies
+        validators = exercise_validators(exercise) or catalog_validators(catalog)
+        not_modified = conditional(request, response, validators)
+        if not_modified:
+            return not_modified
+        return json_response(encode_item(catalog, exercise), response)
+    raise HTTPException(status_code=404, detail="Exercise not found in v2")
+
+@router.get("/{exercise_id}", response_model=ExerciseReadV2)
+async def get_exercise_v2(exercise_id: int, request: Request, response: Response):
+    catalog = await get_catalog_async()
+    exercise = catalog.get(exercise_id)
+    if exercise is not None:
+        validators = exercise_validators(exercise) or catalog_validators(catalog)
+        not_modified = conditional(request, response, validators)
+        if not_modified:
+            return not_modified
+        return json_response(encode_item(catalog, exercise), response)
+    raise HTTPException(status_code=404, detail="Exercise not found in v2")
+
 
 @router.post("/", response_model=ExerciseV2)
 def create_exercise_v2(ex: ExerciseV2, auth=Depends(require_auth)):
@@ -272,10 +694,10 @@ def create_exercise_v2(ex: ExerciseV2, auth=Depends(require_auth)):
                 """, (
                     ex.slug, ex.name, ex.summary, ex.description, ex.primary_muscle,
                     json.dumps(ex.secondary_muscles), json.dumps(ex.equipment), ex.difficulty,
-                    json.dumps([step.dict() for step in ex.steps]), json.dumps(ex.tips),
-                    json.dumps([img.dict() for img in ex.images]), str(ex.video_url) if ex.video_url else None,
+                    json.dumps([step.model_dump() for step in ex.steps]), json.dumps(ex.tips),
+                    json.dumps([img.model_dump(mode='json') for img in ex.images]), str(ex.video_url) if ex.video_url else None,
                     json.dumps(ex.tags), json.dumps(ex.variations), 
-                    json.dumps(ex.estimated.dict()) if ex.estimated else None,
+                    json.dumps(ex.estimated.model_dump()) if ex.estimated else None,
                     ex.created_at or datetime.utcnow()
                 ))
                 ex.id = cursor.fetchone()['id']
@@ -289,16 +711,22 @@ def create_exercise_v2(ex: ExerciseV2, auth=Depends(require_auth)):
                 """, (
                     ex.slug, ex.name, ex.summary, ex.description, ex.primary_muscle,
                     json.dumps(ex.secondary_muscles), json.dumps(ex.equipment), ex.difficulty,
-                    json.dumps([step.dict() for step in ex.steps]), json.dumps(ex.tips),
-                    json.dumps([img.dict() for img in ex.images]), str(ex.video_url) if ex.video_url else None,
+                    json.dumps([step.model_dump() for step in ex.steps]), json.dumps(ex.tips),
+                    json.dumps([img.model_dump(mode='json') for img in ex.images]), str(ex.video_url) if ex.video_url else None,
                     json.dumps(ex.tags), json.dumps(ex.variations), 
-                    json.dumps(ex.estimated.dict()) if ex.estimated else None,
+                    json.dumps(ex.estimated.model_dump()) if ex.estimated else None,
                     (ex.created_at or datetime.utcnow()).isoformat()
                 ))
                 ex.id = cursor.lastrowid
             
+            sync_search_index(cursor, ex.id)
+            sync_relations(cursor, ex.id)
+            record_change(cursor, bump_catalog_version(cursor), ex.id)
             conn.commit()
+        invalidate_catalog()
             
+    except (sqlite3.IntegrityError, psycopg2.IntegrityError):
+        raise HTTPException(status_code=409, detail=f"An exercise with slug '{ex.slug}' already exists")
     except Exception as e:
         logger.error(f"Error creating exercise: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating exercise: {str(e)}")
@@ -306,6 +734,116 @@ def create_exercise_v2(ex: ExerciseV2, auth=Depends(require_auth)):
     return ex
 
 
+def column_value(field, value):
+    """Stored value of the (validated) ExerciseV2 field ``field``"""
+    if field == 'steps':
+        return json.dumps([step.model_dump() for step in value])
+    if field == 'images':
+        return json.dumps([img.model_dump(mode='json') for img in value])
+    if field == 'estimated':
+        return json.dumps(value.model_dump()) if value else None
+    if field == 'video_url':
+        return str(value) if value else None
+    if field in LIST_COLUMNS:
+        return json.dumps(value)
+    return value
+
+
+def exercise_row(ex, now):
+    """Row tuple in ``bulk_load.LOAD_COLUMNS`` order for an ExerciseV2"""
+    created_at = ex.created_at or now
+    if not settings.is_postgresql:
+        created_at, now = created_at.isoformat(), now.isoformat()
+    return tuple(column_value(f, getattr(ex, f)) for f in PATCHABLE_FIELDS) + (created_at, now)
+
+
+def merge_patch(target, patch):
+    """Apply an RFC 7396 JSON Merge Patch: objects merge, null removes, anything else replaces"""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+@router.post("/bulk", response_model=ExerciseBulkResultV2)
+def bulk_upsert_exercises_v2(body: List[Dict[str, Any]], auth=Depends(require_auth)):
+    """Create or update many exercises keyed by slug.
+
+    Items are upserted ``BATCH_SIZE`` at a time, one transaction (and one
+    catalog version) per batch, instead of one call and commit each. Ids in
+    the items are ignored. Every item gets a result in request order: an
+    item that is not a valid ExerciseV2, a repeated slug or a blank
+    name/slug fails only that item, a failed batch fails only its items.
+    """
+    if not body:
+        raise HTTPException(status_code=400, detail="Provide at least one exercise")
+    if len(body) > MAX_BULK_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_SIZE} exercises per request")
+
+    # Validated one by one, so an invalid item fails alone
+    results = []
+    items = []
+    for i, raw in enumerate(body):
+        slug = raw.get('slug')
+        results.append(ExerciseBulkItemV2(index=i, slug=slug if isinstance(slug, str) else None, status='error'))
+        try:
+            items.append(ExerciseV2.model_validate(raw))
+        except ValidationError as e:
+            items.append(None)
+            results[i].detail = '; '.join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors(include_url=False)
+            )
+
+    pending = []
+    seen = set()
+    for i, ex in enumerate(items):
+        if ex is None:
+            continue
+        if not ex.slug.strip() or not ex.name.strip():
+            results[i].detail = "name and slug are required"
+        elif ex.slug in seen:
+            results[i].detail = f"Slug '{ex.slug}' appears earlier in the request"
+        else:
+            seen.add(ex.slug)
+            pending.append(i)
+
+    written = False
+    for start in range(0, len(pending), BATCH_SIZE):
+        batch = pending[start:start + BATCH_SIZE]
+        now = datetime.utcnow()
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                existing = slug_ids(cursor, [items[i].slug for i in batch])
+                ids = upsert_batch(cursor, [exercise_row(items[i], now) for i in batch])
+                sync_search_index_many(cursor, ids.values())
+                sync_relations_many(cursor, ids.values())
+                record_changes(cursor, bump_catalog_version(cursor), ids.values())
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error upserting exercises {batch[0]}-{batch[-1]}: {e}")
+            for i in batch:
+                results[i].detail = f"Error upserting exercise: {str(e)}"
+            continue
+        written = True
+        for i in batch:
+            results[i].id = ids[items[i].slug]
+            results[i].status = 'updated' if items[i].slug in existing else 'created'
+
+    if written:
+        invalidate_catalog()
+
+    counts = {status: sum(r.status == status for r in results) for status in ('created', 'updated', 'error')}
+    return ExerciseBulkResultV2(
+        created=counts['created'], updated=counts['updated'], failed=counts['error'], items=results,
+    )
+
+
 @router.put("/{exercise_id}", response_model=ExerciseV2)
 def update_exercise_v2(exercise_id: int, ex: ExerciseV2, auth=Depends(require_auth)):
     try:
@@ -328,10 +866,10 @@ def update_exercise_v2(exercise_id: int, ex: ExerciseV2, auth=Depends(require_au
                 """, (
                     ex.slug, ex.name, ex.summary, ex.description, ex.primary_muscle,
                     json.dumps(ex.secondary_muscles), json.dumps(ex.equipment), ex.difficulty,
-                    json.dumps([step.dict() for step in ex.steps]), json.dumps(ex.tips),
-                    json.dumps([img.dict() for img in ex.images]), str(ex.video_url) if ex.video_url else None,
+                    json.dumps([step.model_dump() for step in ex.steps]), json.dumps(ex.tips),
+                    json.dumps([img.model_dump(mode='json') for img in ex.images]), str(ex.video_url) if ex.video_url else None,
                     json.dumps(ex.tags), json.dumps(ex.variations), 
-                    json.dumps(ex.estimated.dict()) if ex.estimated else None,
+                    json.dumps(ex.estimated.model_dump()) if ex.estimated else None,
                     datetime.utcnow(), exercise_id
                 ))
             else:
@@ -345,18 +883,24 @@ def update_exercise_v2(exercise_id: int, ex: ExerciseV2, auth=Depends(require_au
                 """, (
                     ex.slug, ex.name, ex.summary, ex.description, ex.primary_muscle,
                     json.dumps(ex.secondary_muscles), json.dumps(ex.equipment), ex.difficulty,
-                    json.dumps([step.dict() for step in ex.steps]), json.dumps(ex.tips),
-                    json.dumps([img.dict() for img in ex.images]), str(ex.video_url) if ex.video_url else None,
+                    json.dumps([step.model_dump() for step in ex.steps]), json.dumps(ex.tips),
+                    json.dumps([img.model_dump(mode='json') for img in ex.images]), str(ex.video_url) if ex.video_url else None,
                     json.dumps(ex.tags), json.dumps(ex.variations), 
-                    json.dumps(ex.estimated.dict()) if ex.estimated else None,
+                    json.dumps(ex.estimated.model_dump()) if ex.estimated else None,
                     datetime.utcnow().isoformat(), exercise_id
                 ))
             
+            sync_search_index(cursor, exercise_id)
+            sync_relations(cursor, exercise_id)
+            record_change(cursor, bump_catalog_version(cursor), exercise_id)
             conn.commit()
             ex.id = exercise_id
+        invalidate_catalog()
             
     except HTTPException:
         raise
+    except (sqlite3.IntegrityError, psycopg2.IntegrityError):
+        raise HTTPException(status_code=409, detail=f"An exercise with slug '{ex.slug}' already exists")
     except Exception as e:
         logger.error(f"Error updating exercise: {e}")
         raise HTTPException(status_code=500, detail=f"Error updating exercise: {str(e)}")
@@ -364,13 +908,111 @@ def update_exercise_v2(exercise_id: int, ex: ExerciseV2, auth=Depends(require_au
     return ex
 
 
+@router.patch("/{exercise_id}", response_model=ExerciseReadV2)
+def patch_exercise_v2(
+    exercise_id: int,
+    request: Request,
+    response: Response,
+    patch: Dict[str, Any] = Body(..., media_type="application/merge-patch+json"),
+    auth=Depends(require_auth),
+):
+    """Partially update an exercise with a JSON Merge Patch (RFC 7396).
+
+    Only the columns whose value changes are written, plus ``updated_at``;
+    the search index and relations are refreshed only if their columns
+    changed, and a patch that changes nothing writes nothing. With
+    ``If-Match`` (the ``ETag`` of ``GET /{id}`` or of a previous PATCH) the
+    update only applies if the exercise has not changed since: 412 otherwise.
+    """
+    fields = set(patch) - set(PATCHABLE_FIELDS)
+    if fields:
+        raise HTTPException(status_code=400, detail=f"Unknown or read-only fields: {', '.join(sorted(fields))}")
+
+    p = placeholder()
+    select = f"SELECT {', '.join(EXERCISE_COLUMNS)} FROM exercises WHERE id = {p}"
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(select, (exercise_id,))
+            row = cursor.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail='Exercise not found')
+            current = decode_exercise_row(row)
+            validators = exercise_validators(current)
+            if not if_match(request, validators and validators[0]):
+                raise HTTPException(status_code=412, detail='Exercise has changed, fetch it again')
+
+            # Merge, then validate and serialize only the patched fields
+            merged = merge_patch(current, patch)
+            values, errors = {}, []
+            for field in patch:
+                value = merged.get(field)
+                if field not in merged:
+                    model_field = ExerciseV2.model_fields[field]
+                    value = None if model_field.is_required() else model_field.get_default(call_default_factory=True)
+                try:
+                    value = column_value(field, FIELD_ADAPTERS[field].validate_python(value))
+                except ValidationError as e:
+                    errors += [{**error, 'loc': ('body', field, *error['loc'])} for error in e.errors(include_url=False, include_context=False)]
+                    continue
+                stored = json.loads(value) if value is not None and field in JSON_COLUMNS else value
+                if stored != current[field]:
+                    values[field] = value
+            if errors:
+                raise HTTPException(status_code=422, detail=errors)
+
+            if values:
+                now = datetime.utcnow()
+                assignments = ', '.join(f"{field} = {p}" for field in values)
+                params = [*values.values(), now if settings.is_postgresql else now.isoformat(), exercise_id]
+                guard = ""
+                if request.headers.get('if-match', '*').strip() != '*':
+                    # The row must still be the one If-Match was checked against
+                    guard = f" AND updated_at = {p}"
+                    params.append(row['updated_at'])
+                cursor.execute(f"UPDATE exercises SET {assignments}, updated_at = {p} WHERE id = {p}{guard}", params)
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    raise HTTPException(status_code=412, detail='Exercise has changed, fetch it again')
+
+                if set(values) & set(INDEXED_COLUMNS):
+                    sync_search_index(cursor, exercise_id)
+                if set(values) & set(RELATION_COLUMNS.values()):
+                    sync_relations(cursor, exercise_id)
+                record_change(cursor, bump_catalog_version(cursor), exercise_id)
+                conn.commit()
+
+                cursor.execute(select, (exercise_id,))
+                current = decode_exercise_row(cursor.fetchone())
+        if values:
+            invalidate_catalog()
+
+    except HTTPException:
+        raise
+    except (sqlite3.IntegrityError, psycopg2.IntegrityError):
+        raise HTTPException(status_code=409, detail=f"An exercise with slug '{patch.get('slug')}' already exists")
+    except Exception as e:
+        logger.error(f"Error patching exercise: {e}")
+        raise HTTPException(status_code=500, detail=f"Error patching exercise: {str(e)}")
+
+    validators = exercise_validators(current)
+    if validators:
+        response.headers['ETag'] = validators[0]
+    return transform(current)
+
+
 @router.delete("/{exercise_id}", status_code=204)
 def delete_exercise_v2(exercise_id: int, auth=Depends(require_auth)):
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM exercises WHERE id = %s' if settings.is_production else 'DELETE FROM exercises WHERE id = ?', (exercise_id,))
+            if cursor.rowcount:
+                sync_search_index(cursor, exercise_id)
+                sync_relations(cursor, exercise_id)
+                record_change(cursor, bump_catalog_version(cursor), exercise_id, DELETE)
             conn.commit()
+        invalidate_catalog()
             
     except Exception as e:
         logger.error(f"Error deleting exercise: {e}")
@@ -388,78 +1030,22 @@ def migrate_now(auth=Depends(require_auth)):
         if current_count > 0:
             return {"status": "already_migrated", "count": current_count}
         
-        # Read JSON data
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            raw_exercises = json.load(f)
-        
-        logger.info(f"Migrating {len(raw_exercises)} exercises from JSON to database")
+        logger.info(f"Migrating exercises from {DATA_FILE.name} to database")
         
-        # Insert exercises into database
+        # Stream the JSON file into a bulk insert (v1 format converted to v2) in one transaction
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            
-            for item in raw_exercises:
-                # Convert v1 format to v2 format
-                steps = []
-                if item.get('instructions'):
-                    steps = [{"order": 1, "instruction": item['instructions']}]
-                
-                if settings.is_production:
-                    # PostgreSQL insert
-                    cursor.execute("""
-                        INSERT INTO exercises (slug, name, summary, description, primary_muscle, 
-                                             secondary_muscles, equipment, difficulty, steps, tips, 
-                                             images, video_url, tags, variations, estimated, created_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        slugify(item.get('name', '')),
-                        item.get('name'),
-                        (item.get('instructions') or '')[:120],
-                        item.get('instructions'),
-                        item.get('muscle'),
-                        json.dumps([]),  # secondary_muscles
-                        json.dumps([item.get('equipment')] if item.get('equipment') else []),
-                        item.get('difficulty'),
-                        json.dumps(steps),
-                        json.dumps([]),  # tips
-                        json.dumps([]),  # images
-                        None,  # video_url
-                        json.dumps([]),  # tags
-                        json.dumps([]),  # variations
-                        None,  # estimated
-                        datetime.utcnow()
-                    ))
-                else:
-                    # SQLite insert
-                    cursor.execute("""
-                        INSERT INTO exercises (slug, name, summary, description, primary_muscle, 
-                                             secondary_muscles, equipment, difficulty, steps, tips, 
-                                             images, video_url, tags, variations, estimated, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        slugify(item.get('name', '')),
-                        item.get('name'),
-                        (item.get('instructions') or '')[:120],
-                        item.get('instructions'),
-                        item.get('muscle'),
-                        json.dumps([]),  # secondary_muscles
-                        json.dumps([item.get('equipment')] if item.get('equipment') else []),
-                        item.get('difficulty'),
-                        json.dumps(steps),
-                        json.dumps([]),  # tips
-                        json.dumps([]),  # images
-                        None,  # video_url
-                        json.dumps([]),  # tags
-                        json.dumps([]),  # variations
-                        None,  # estimated
-                        datetime.utcnow().isoformat()
-                    ))
-            
+            rows = convert(iter_json_array(DATA_FILE), row_from_v1, datetime.utcnow().isoformat())
+            load = bulk_insert(cursor, rows)
+            sync_search_index(cursor)
+            sync_relations(cursor)
+            record_reset(cursor, bump_catalog_version(cursor))
             conn.commit()
+        invalidate_catalog()
         
         final_count = get_exercise_count()
         logger.info(f"Migration completed successfully. Total exercises: {final_count}")
-        return {"status": "migrated", "count": final_count}
+        return {"status": "migrated", "count": final_count, "load": load}
         
     except Exception as e:
         logger.error(f"Migration error: {e}")
@@ -468,133 +1054,85 @@ def migrate_now(auth=Depends(require_auth)):
 
 @router.post("/force-migrate", status_code=200)
 def force_migrate_all(auth=Depends(require_auth)):
-    """Force complete migration, clearing existing data first and using complete JSON"""
+    """Force complete migration, replacing existing data with the complete JSON.
+
+    The file is streamed into shadow tables, validated, indexed and
+    committed, then swapped in by a short transaction of renames (see
+    app/catalog_swap.py): readers see the complete old catalog until the
+    swap commits and an unreadable or invalid file changes nothing. The
+    replaced catalog is kept for ``POST /force-migrate/rollback``.
+    """
     try:
-        logger.info("Starting FORCE migration - clearing all existing data")
-        
-        # Clear existing data first
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            if settings.is_production:
-                cursor.execute("DELETE FROM exercises")
-                cursor.execute("ALTER SEQUENCE exercises_id_seq RESTART WITH 1")
-            else:
-                cursor.execute("DELETE FROM exercises")
-                cursor.execute("DELETE FROM sqlite_sequence WHERE name='exercises'")
-            conn.commit()
-        
-        logger.info("Existing data cleared, reading complete exercises...")
-        
         # Read from exercises_complete.json instead of exercises.json
         complete_data_file = Path(__file__).resolve().parent.parent.parent / "data" / "exercises_complete.json"
-        
         if not complete_data_file.exists():
             # Fallback to regular exercises.json
             complete_data_file = DATA_FILE
             logger.warning(f"Complete JSON not found, using: {complete_data_file}")
         
-        with open(complete_data_file, 'r', encoding='utf-8') as f:
-            raw_exercises = json.load(f)
+        logger.info(f"Starting FORCE migration from {complete_data_file.name}")
         
-        logger.info(f"Force migrating {len(raw_exercises)} exercises from {complete_data_file.name}")
-        
-        # Insert all exercises
-        migrated_count = 0
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            
-            for item in raw_exercises:
-                try:
-                    # Handle both v1 and v2 format
-                    steps_data = item.get('steps', [])
-                    if isinstance(steps_data, str):
-                        steps_data = [{"order": 1, "instruction": steps_data}]
-                    elif not steps_data and item.get('instructions'):
-                        steps_data = [{"order": 1, "instruction": item['instructions']}]
-                    
-                    # Handle images
-                    images_data = item.get('images', [])
-                    if isinstance(images_data, str):
-                        images_data = []
-                    
-                    # Handle equipment
-                    equipment_data = item.get('equipment', [])
-                    if isinstance(equipment_data, str):
-                        equipment_data = [equipment_data] if equipment_data else []
-                    
-                    if settings.is_production:
-                        # PostgreSQL insert
-                        cursor.execute("""
-                            INSERT INTO exercises (slug, name, summary, description, primary_muscle, 
-                                                 secondary_muscles, equipment, difficulty, steps, tips, 
-                                                 images, video_url, tags, variations, estimated, created_at, updated_at)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (
-                            item.get('slug', slugify(item.get('name', ''))),
-                            item.get('name', ''),
-                            item.get('summary', (item.get('description') or item.get('instructions', ''))[:120]),
-                            item.get('description', item.get('instructions', '')),
-                            item.get('primary_muscle', item.get('muscle', '')),
-                            json.dumps(item.get('secondary_muscles', [])),
-                            json.dumps(equipment_data),
-                            item.get('difficulty', 'intermediate'),
-                            json.dumps(steps_data),
-                            json.dumps(item.get('tips', [])),
-                            json.dumps(images_data),
-                            item.get('video_url'),
-                            json.dumps(item.get('tags', [])),
-                            json.dumps(item.get('variations', [])),
-                            json.dumps(item.get('estimated')) if item.get('estimated') else None,
-                            item.get('created_at', datetime.utcnow().isoformat()),
-                            item.get('updated_at', datetime.utcnow().isoformat())
-                        ))
-                    else:
-                        # SQLite insert
-                        cursor.execute("""
-                            INSERT INTO exercises (slug, name, summary, description, primary_muscle, 
-                                                 secondary_muscles, equipment, difficulty, steps, tips, 
-                                                 images, video_url, tags, variations, estimated, created_at, updated_at)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            item.get('slug', slugify(item.get('name', ''))),
-                            item.get('name', ''),
-                            item.get('summary', (item.get('description') or item.get('instructions', ''))[:120]),
-                            item.get('description', item.get('instructions', '')),
-                            item.get('primary_muscle', item.get('muscle', '')),
-                            json.dumps(item.get('secondary_muscles', [])),
-                            json.dumps(equipment_data),
-                            item.get('difficulty', 'intermediate'),
-                            json.dumps(steps_data),
-                            json.dumps(item.get('tips', [])),
-                            json.dumps(images_data),
-                            item.get('video_url'),
-                            json.dumps(item.get('tags', [])),
-                            json.dumps(item.get('variations', [])),
-                            json.dumps(item.get('estimated')) if item.get('estimated') else None,
-                            item.get('created_at', datetime.utcnow().isoformat()),
-                            item.get('updated_at', datetime.utcnow().isoformat())
-                        ))
-                    
-                    migrated_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error migrating exercise {item.get('name', 'unknown')}: {e}")
-                    continue
-            
+            # Load all exercises (v1 and v2 formats) into the shadow table
+            create_shadow(cursor)
+            items = normalize_items(iter_json_array(complete_data_file))
+            load = bulk_insert(cursor, convert(items, row_from_item, datetime.utcnow().isoformat()), table=SHADOW_TABLE)
+            validate_shadow(cursor)
+            prepare_shadow(cursor)
+            conn.commit()
+
+            swap_in(cursor, SHADOW)
+            record_reset(cursor, bump_catalog_version(cursor))
+            conn.commit()
+            drop_retired(cursor)
             conn.commit()
+        invalidate_catalog()
         
         final_count = get_exercise_count()
-        logger.info(f"FORCE migration completed successfully. Migrated: {migrated_count}, Total: {final_count}")
+        logger.info(f"FORCE migration completed successfully. Migrated: {load['rows']}, Total: {final_count}")
         
         return {
             "status": "force_migrated", 
-            "migrated": migrated_count,
+            "migrated": load['rows'],
             "total_count": final_count,
             "source_file": complete_data_file.name,
-            "database_type": "PostgreSQL" if settings.is_production else "SQLite"
+            "database_type": "PostgreSQL" if settings.is_production else "SQLite",
+            "load": load,
         }
         
+    except ValueError as e:
+        logger.error(f"Force migration rejected: {e}")
+        raise HTTPException(status_code=422, detail=f"Force migration rejected: {str(e)}")
+    except TimeoutError as e:
+        logger.error(f"Force migration not swapped in: {e}")
+        raise HTTPException(status_code=503, detail=f"Force migration not swapped in, try again later: {str(e)}")
     except Exception as e:
         logger.error(f"Force migration error: {e}")
         raise HTTPException(status_code=500, detail=f"Force migration error: {str(e)}")
 
+
+@router.post("/force-migrate/rollback", status_code=200)
+def rollback_force_migrate(auth=Depends(require_auth)):
+    """Swap the catalog replaced by the last force-migrate back in.
+
+    The current catalog is parked in its place, so a rollback can itself
+    be undone by calling this again.
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            rollback(cursor)
+            record_reset(cursor, bump_catalog_version(cursor))
+            conn.commit()
+        invalidate_catalog()
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except TimeoutError as e:
+        logger.error(f"Rollback not swapped in: {e}")
+        raise HTTPException(status_code=503, detail=f"Rollback not swapped in, try again later: {str(e)}")
+    except Exception as e:
+        logger.error(f"Rollback error: {e}")
+        raise HTTPException(status_code=500, detail=f"Rollback error: {str(e)}")
+
+    return {"status": "rolled_back", "total_count": get_exercise_count()}
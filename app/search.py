@@ -0,0 +1,188 @@
+"""Accent-insensitive, typo-tolerant matching over exercise names.
+
+Text is folded (lowercase, accents removed) and lightly stemmed for Spanish
+plurals. ``TrigramIndex`` keeps pg_trgm style trigrams for every distinct
+word in the catalog plus the exercises containing each word, so a fuzzy
+lookup only compares the query against the (small) vocabulary and then
+intersects posting sets; it never scans the exercises themselves.
+"""
+import bisect
+import heapq
+import itertools
+import re
+import unicodedata
+
+
+def fold(text):
+    """Lowercase and strip accents: "Búlgara" -> "bulgara", "muñeca" -> "muneca" """
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def stem(word):
+    """Very light Spanish stemmer: drops plural endings (flexiones -> flexion)"""
+    if len(word) > 4 and word.endswith('es') and word[-3] not in 'aeiou':
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize(text):
+    """Folded, stemmed word tokens of ``text``"""
+    return [stem(w) for w in re.findall(r'\w+', fold(text))]
+
+
+def trigrams(words):
+    """pg_trgm style trigrams: each word padded with two leading and one trailing space"""
+    grams = set()
+    for word in words:
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """pg_trgm similarity between two trigram sets"""
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+class TrigramIndex:
+    """Word-level trigram index over exercise names and tags."""
+
+    def __init__(self, exercises):
+        self.texts = {}
+        self.lengths = {}
+        self.word_grams = {}
+        self.word_postings = {}
+        gram_words = {}
+        for exercise in exercises:
+            exercise_id = exercise.get('id')
+            if exercise_id is None:
+                continue
+            words = normalize(' '.join([exercise.get('name') or ''] + list(exercise.get('tags') or [])))
+            self.texts[exercise_id] = ' '.join(words)
+            self.lengths[exercise_id] = len(words)
+            for word in words:
+                if word not in self.word_postings:
+                    self.word_postings[word] = set()
+                    grams = self.word_grams[word] = frozenset(trigrams([word]))
+                    for gram in grams:
+                        gram_words.setdefault(gram, []).append(word)
+                self.word_postings[word].add(exercise_id)
+        self.gram_words = {gram: tuple(words) for gram, words in gram_words.items()}
+
+    def similar_words(self, word, threshold):
+        """Vocabulary words whose trigram similarity to ``word`` is >= threshold"""
+        grams = frozenset(trigrams([word]))
+        candidates = set()
+        for gram in grams:
+            candidates.update(self.gram_words.get(gram, ()))
+        matches = {}
+        for candidate in candidates:
+            score = similarity(grams, self.word_grams[candidate])
+            if score >= threshold:
+                matches[candidate] = score
+        return matches
+
+    def search(self, query, threshold=0.5):
+        """Return ``[(id, score)]`` best first.
+
+        Every query word must match some word of the exercise with trigram
+        similarity >= ``threshold`` ("sentadila" ~ "sentadilla"); the score
+        is the mean of the best similarity per query word. Ties favour
+        shorter names.
+        """
+        words = normalize(query)
+        if not words:
+            return []
+
+        per_word = []
+        candidates = None
+        for word in words:
+            matches = self.similar_words(word, threshold)
+            if not matches:
+                return []
+            ids = set()
+            for match in matches:
+                ids |= self.word_postings[match]
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return []
+            per_word.append(matches)
+
+        hits = []
+        for exercise_id in candidates:
+            total = 0.0
+            for matches in per_word:
+                total += max(score for match, score in matches.items() if exercise_id in self.word_postings[match])
+            hits.append((exercise_id, total / len(per_word)))
+        hits.sort(key=lambda h: (-h[1], self.lengths[h[0]], h[0]))
+        return [(exercise_id, round(score, 4)) for exercise_id, score in hits]
+
+
+class PrefixIndex:
+    """Sorted prefix index for typeahead over folded names and tags.
+
+    Every exercise contributes one key per word of its name (the name from
+    that word on, so "ba" finds "Press Banca") and one per tag. Lookups are a
+    binary search plus a scan over the matching range.
+
+    Entries are cached per exercise; building from a previous index only
+    re-normalizes exercises whose name or tags changed. Results for one and
+    two character prefixes (the widest ranges) are memoized.
+    """
+
+    MAX_SUGGESTIONS = 50
+    MEMO_PREFIX_LENGTH = 2
+
+    def __init__(self, exercises, previous=None):
+        reuse = previous.by_id if previous is not None else {}
+        self.by_id = {}
+        entries = []
+        for exercise in exercises:
+            exercise_id = exercise.get('id')
+            if exercise_id is None:
+                continue
+            signature = (exercise.get('name'), tuple(exercise.get('tags') or ()))
+            cached = reuse.get(exercise_id)
+            if cached is None or cached[0] != signature:
+                cached = (signature, self._entries(exercise_id, *signature))
+            self.by_id[exercise_id] = cached
+            entries.extend(cached[1])
+        entries.sort()
+        self.keys = [e[0] for e in entries]
+        self.entries = entries
+        self._memo = {}
+
+    @staticmethod
+    def _entries(exercise_id, name, tags):
+        """``(key, kind, name_length, id)``; kind 0 = name start, 1 = inner word, 2 = tag"""
+        words = fold(name).split()
+        entries = [(' '.join(words[i:]), 0 if i == 0 else 1, len(words), exercise_id) for i in range(len(words))]
+        entries += [(fold(tag), 2, len(words), exercise_id) for tag in tags if tag]
+        return entries
+
+    def suggest(self, prefix, limit=10):
+        """Ids of the best ``limit`` exercises whose name or tags start with ``prefix``"""
+        prefix = ' '.join(fold(prefix).split())
+        if not prefix:
+            return []
+        if len(prefix) <= self.MEMO_PREFIX_LENGTH:
+            ids = self._memo.get(prefix)
+            if ids is None:
+                ids = self._memo[prefix] = self._scan(prefix, self.MAX_SUGGESTIONS)
+            return ids[:limit]
+        return self._scan(prefix, limit)
+
+    def _scan(self, prefix, limit):
+        start = bisect.bisect_left(self.keys, prefix)
+        best = {}
+        for key, kind, length, exercise_id in itertools.islice(self.entries, start, None):
+            if not key.startswith(prefix):
+                break
+            rank = (kind, length, key)
+            if exercise_id not in best or rank < best[exercise_id]:
+                best[exercise_id] = rank
+        return [exercise_id for exercise_id, _ in heapq.nsmallest(limit, best.items(), key=lambda item: (item[1], item[0]))]
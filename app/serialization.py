@@ -0,0 +1,46 @@
+"""Fast JSON encoding and streaming helpers for v2 responses.
+
+Uses orjson when it is installed and the standard library otherwise. Both
+produce compact UTF-8 bytes, like FastAPI's default JSONResponse.
+"""
+import json
+import zlib
+
+from fastapi import Request, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def dumps(value):
+    """Encode an already JSON-compatible value (e.g. ``model_dump(mode='json')``) to bytes"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_array(parts):
+    """Join pre-encoded JSON values into a JSON array"""
+    return b'[' + b','.join(parts) + b']'
+
+
+def json_response(body, response=None):
+    """Wrap pre-encoded bytes, keeping headers already set on the injected ``response``"""
+    headers = dict(response.headers) if response is not None else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def accepts_gzip(request: Request):
+    return 'gzip' in request.headers.get('accept-encoding', '').lower()
+
+
+def gzip_stream(chunks, level=6):
+    """Gzip an iterable of byte chunks incrementally (one compressed block per chunk)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
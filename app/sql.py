@@ -0,0 +1,40 @@
+"""SQL fragments for statements over a list of exercise ids (or slugs).
+
+The ids travel as one parameter (a PostgreSQL array, a JSON array on
+SQLite), so a batch write runs a fixed number of statements whatever its
+size and no statement text depends on the batch length.
+"""
+import json
+
+from app.config import settings
+
+
+def any_id(column):
+    """Condition: ``column`` is one of the ids passed as ``ids_param(...)``"""
+    if settings.is_postgresql:
+        return f"{column} = ANY(%s)"
+    return f"{column} IN (SELECT value FROM json_each(?))"
+
+
+def any_value(column):
+    """Condition: ``column`` is one of the strings passed as ``values_param(...)``"""
+    return any_id(column)
+
+
+def id_rows():
+    """FROM item yielding the ids passed as ``ids_param(...)`` as column ``value``"""
+    if settings.is_postgresql:
+        return "unnest(%s::integer[]) AS ids(value)"
+    return "json_each(?)"
+
+
+def ids_param(ids):
+    """Bind value for ``any_id`` / ``id_rows``"""
+    ids = [int(i) for i in ids]
+    return ids if settings.is_postgresql else json.dumps(ids)
+
+
+def values_param(values):
+    """Bind value for ``any_value``"""
+    values = [str(v) for v in values]
+    return values if settings.is_postgresql else json.dumps(values)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Benchmark: acceso síncrono (threadpool) vs async a la base de datos.
+
+Lanza ``--requests`` consultas con ``--concurrency`` en vuelo a la vez, con
+la misma consulta de página que usa ``GET /v2/exercises``:
+
+- sync: ``get_db_connection()`` dentro del threadpool de Starlette, como
+  hacían los handlers ``def`` (el threadpool admite 40 hilos por defecto).
+- async: ``fetch_all()`` de app/async_database.py, en el event loop.
+
+``--latency`` añade un retardo por consulta (ms) para simular la ida y
+vuelta a una base de datos remota (p. ej. PostgreSQL en Render); con SQLite
+local las consultas tardan microsegundos y el threadpool no llega a
+saturarse. ``--http`` mide además el endpoint completo a través de la app.
+
+Uso:
+    python scripts/benchmark_async.py --requests 2000 --concurrency 200 --latency 5
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from starlette.concurrency import run_in_threadpool
+
+from app.async_database import fetch_all, close_async_pools
+from app.database import get_db_connection
+from app.queries import KEY_COLUMNS, build_list_query
+
+
+def sync_query(sql, params, latency):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        if latency:
+            time.sleep(latency)
+        return rows
+
+
+async def async_query(sql, params, latency):
+    rows = await fetch_all(sql, params)
+    if latency:
+        await asyncio.sleep(latency)
+    return rows
+
+
+async def run(name, call, total, concurrency):
+    """Run ``call()`` ``total`` times with at most ``concurrency`` in flight"""
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{name:<6} {total / elapsed:>9.0f} req/s   "
+        f"p50 {statistics.median(latencies) * 1000:>7.2f} ms   p99 {p99 * 1000:>7.2f} ms"
+    )
+
+
+async def main(total, concurrency, latency, http):
+    sql, params = build_list_query(limit=20, columns=KEY_COLUMNS)
+    latency = latency / 1000
+
+    print(f"{total} consultas, concurrencia {concurrency}, latencia simulada {latency * 1000:.1f} ms")
+    await run("sync", lambda: run_in_threadpool(sync_query, sql, params, latency), total, concurrency)
+    await run("async", lambda: async_query(sql, params, latency), total, concurrency)
+
+    if http:
+        import httpx
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await run("http", lambda: client.get("/v2/exercises/", params={"limit": 20}), total, concurrency)
+
+    await close_async_pools()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--concurrency", type=int, default=200)
+    p.add_argument("--latency", type=float, default=0.0, help="Retardo simulado por consulta, en ms")
+    p.add_argument("--http", action="store_true", help="Medir también GET /v2/exercises/ extremo a extremo")
+    args = p.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency, args.http))
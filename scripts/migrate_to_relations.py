@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Migration script to (re)build the normalized relations of the exercises table.
+Fills the `terms` vocabulary and the exercise_equipment / exercise_secondary_muscles /
+exercise_tags join tables from the JSON columns (see app/relations.py).
+
+init_database() already backfills them the first time they are created; run this
+after editing exercises outside the API (e.g. direct SQL) to resynchronize.
+"""
+import sys
+import logging
+from pathlib import Path
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import get_db_connection, init_database, bump_catalog_version
+from app.relations import RELATION_TABLES, sync_relations
+from app.config import settings
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_relations():
+    """Rebuild every relation in one transaction"""
+    try:
+        logger.info("Starting relations migration...")
+        logger.info(f"Database: {'PostgreSQL' if settings.is_postgresql else 'SQLite'}")
+
+        # Creates the tables if needed
+        init_database()
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            sync_relations(cursor)
+            # Memoized list results in running workers depend on the relations
+            version = bump_catalog_version(cursor)
+            conn.commit()
+
+            cursor.execute("SELECT COUNT(*) AS count FROM terms")
+            logger.info(f"Vocabulary contains {cursor.fetchone()['count']} terms")
+            for table in RELATION_TABLES.values():
+                cursor.execute(f"SELECT COUNT(*) AS count FROM {table}")
+                logger.info(f"{table}: {cursor.fetchone()['count']} rows")
+
+        logger.info(f"Relations rebuilt at catalog version {version}")
+
+    except Exception as e:
+        logger.error(f"Relations migration failed: {e}")
+        raise
+
+if __name__ == "__main__":
+    migrate_relations()
@@ -5,7 +5,6 @@ This script should be run in production to migrate data from the JSON file to Po
 """
 import os
 import sys
-import json
 import logging
 from datetime import datetime
 from pathlib import Path
@@ -13,26 +12,17 @@ from pathlib import Path
 # Add the parent directory to sys.path to import app modules
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.database import get_db_connection, init_database, get_exercise_count
+from app.database import get_db_connection, init_database, get_exercise_count, bump_catalog_version
+from app.bulk_load import bulk_insert, convert, iter_json_array, normalize_items, row_from_item
+from app.changes import record_reset
+from app.fulltext import sync_search_index
+from app.relations import sync_relations
 from app.config import settings
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def slugify(name: str) -> str:
-    """Convert name to URL-friendly slug"""
-    import re
-    name = name.lower()
-    name = re.sub(r'[áàäâ]', 'a', name)
-    name = re.sub(r'[éèëê]', 'e', name)
-    name = re.sub(r'[íìïî]', 'i', name)
-    name = re.sub(r'[óòöô]', 'o', name)
-    name = re.sub(r'[úùüû]', 'u', name)
-    name = re.sub(r'[^a-z0-9\s-]', '', name)
-    name = re.sub(r'[\s-]+', '-', name)
-    return name.strip('-')
-
 def migrate_exercises():
     """Main migration function"""
     try:
@@ -54,99 +44,27 @@ def migrate_exercises():
             Path(__file__).parent.parent / "data" / "exercises.json"
         ]
         
-        raw_exercises = None
-        for data_file in data_files:
-            if data_file.exists():
-                logger.info(f"Loading exercises from: {data_file}")
-                with open(data_file, 'r', encoding='utf-8') as f:
-                    raw_exercises = json.load(f)
-                break
-        
-        if not raw_exercises:
+        data_file = next((f for f in data_files if f.exists()), None)
+        if data_file is None:
             logger.error("No exercise data files found")
             return
         
-        logger.info(f"Found {len(raw_exercises)} exercises to migrate")
+        logger.info(f"Streaming exercises from: {data_file}")
         
-        # Migrate exercises
-        migrated_count = 0
+        # Migrate exercises: the file is parsed and inserted in bounded batches
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute("SELECT slug FROM exercises")
+            existing = [row['slug'] for row in cursor.fetchall()]
             
-            for item in raw_exercises:
-                try:
-                    # Convert data to v2 format
-                    name = item.get('name', '')
-                    slug = slugify(name)
-                    
-                    # Handle different field names between v1 and v2
-                    primary_muscle = item.get('primary_muscle') or item.get('muscle', '')
-                    equipment = item.get('equipment', [])
-                    if isinstance(equipment, str):
-                        equipment = [equipment]
-                    
-                    # Handle steps
-                    steps = item.get('steps', [])
-                    if not steps and item.get('instructions'):
-                        steps = [{"order": 1, "instruction": item['instructions']}]
-                    
-                    if settings.is_production:
-                        # PostgreSQL insert
-                        cursor.execute("""
-                            INSERT INTO exercises (slug, name, summary, description, primary_muscle, 
-                                                 secondary_muscles, equipment, difficulty, steps, tips, 
-                                                 images, video_url, tags, variations, estimated, created_at)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (slug) DO NOTHING
-                        """, (
-                            slug,
-                            name,
-                            item.get('summary') or (item.get('description') or item.get('instructions', ''))[:120],
-                            item.get('description') or item.get('instructions'),
-                            primary_muscle,
-                            json.dumps(item.get('secondary_muscles', [])),
-                            json.dumps(equipment),
-                            item.get('difficulty'),
-                            json.dumps(steps),
-                            json.dumps(item.get('tips', [])),
-                            json.dumps(item.get('images', [])),
-                            item.get('video_url'),
-                            json.dumps(item.get('tags', [])),
-                            json.dumps(item.get('variations', [])),
-                            json.dumps(item.get('estimated')) if item.get('estimated') else None,
-                            datetime.utcnow()
-                        ))
-                    else:
-                        # SQLite insert  
-                        cursor.execute("""
-                            INSERT OR IGNORE INTO exercises (slug, name, summary, description, primary_muscle, 
-                                                           secondary_muscles, equipment, difficulty, steps, tips, 
-                                                           images, video_url, tags, variations, estimated, created_at)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            slug, name,
-                            item.get('summary') or (item.get('description') or item.get('instructions', ''))[:120],
-                            item.get('description') or item.get('instructions'),
-                            primary_muscle,
-                            json.dumps(item.get('secondary_muscles', [])),
-                            json.dumps(equipment),
-                            item.get('difficulty'),
-                            json.dumps(steps),
-                            json.dumps(item.get('tips', [])),
-                            json.dumps(item.get('images', [])),
-                            item.get('video_url'),
-                            json.dumps(item.get('tags', [])),
-                            json.dumps(item.get('variations', [])),
-                            json.dumps(item.get('estimated')) if item.get('estimated') else None,
-                            datetime.utcnow().isoformat()
-                        ))
-                    
-                    migrated_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error migrating exercise {item.get('name', 'Unknown')}: {e}")
-                    continue
+            items = normalize_items(iter_json_array(data_file))
+            rows = convert(items, row_from_item, datetime.utcnow().isoformat())
+            load = bulk_insert(cursor, rows, skip_slugs=existing)
+            migrated_count = load['rows']
             
+            sync_search_index(cursor)
+            sync_relations(cursor)
+            record_reset(cursor, bump_catalog_version(cursor))
             conn.commit()
         
         logger.info(f"Successfully migrated {migrated_count} exercises")
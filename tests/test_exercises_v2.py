@@ -0,0 +1,675 @@
+import os
+import tempfile
+
+# Use a throwaway SQLite database; must be set before the app is imported
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.auth import create_access_token
+from app import catalog
+
+client = TestClient(app)
+TOKEN = create_access_token({'sub': 'admin'})
+
+
+@pytest.fixture(scope='module', autouse=True)
+def seeded():
+    r = client.post('/v2/exercises/force-migrate', params={'token': TOKEN})
+    assert r.status_code == 200
+    return r.json()
+
+
+def new_exercise(slug, **extra):
+    body = {
+        'slug': slug,
+        'name': slug.replace('-', ' ').title(),
+        'description': 'test',
+        'primary_muscle': 'chest',
+        'difficulty': 'beginner',
+        'equipment': ['barbell'],
+    }
+    body.update(extra)
+    return body
+
+
+def test_catalog_snapshot_reused_between_reads():
+    first = catalog.get_catalog()
+    client.get('/v2/exercises/')
+    assert catalog.get_catalog() is first
+
+
+def test_write_rebuilds_catalog():
+    before = catalog.get_catalog()
+    r = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-catalog-write'))
+    assert r.status_code == 200
+    after = catalog.get_catalog()
+    assert after.version > before.version
+    assert client.get(f"/v2/exercises/{r.json()['id']}").json()['slug'] == 'test-catalog-write'
+
+
+def test_unknown_id_is_404():
+    assert client.get('/v2/exercises/999999').status_code == 404
+
+
+def test_list_filters_and_pages_in_sql():
+    client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-sql-filter', equipment=['Kettlebell']))
+    r = client.get('/v2/exercises/', params={'equipment': 'kettlebell', 'muscle': 'CHEST'})
+    assert [e['slug'] for e in r.json()] == ['test-sql-filter']
+
+    page1 = client.get('/v2/exercises/', params={'limit': 5}).json()
+    page2 = client.get('/v2/exercises/', params={'limit': 5, 'page': 2}).json()
+    assert len(page1) == len(page2) == 5
+    assert page1[-1]['id'] < page2[0]['id']
+
+
+def test_cursor_pagination_walks_catalog_once():
+    seen = []
+    cursor = ''
+    while cursor is not None:
+        body = client.get('/v2/exercises/', params={'limit': 25, 'sort': 'name', 'cursor': cursor}).json()
+        seen += [e['id'] for e in body['items']]
+        cursor = body['next_cursor']
+    assert body['total'] == len(seen) == len(set(seen))
+
+
+def test_invalid_cursor_is_400():
+    assert client.get('/v2/exercises/', params={'cursor': 'not-a-cursor'}).status_code == 400
+    # Well-formed JSON, but the sort value has the wrong type for the sort
+    from app.queries import encode_cursor
+    for sort, value in (('name', {'a': 1}), ('relevance', 'x'), ('id', None)):
+        params = {'sort': sort, 'cursor': encode_cursor(sort, value, 3), 'query': 'press'}
+        assert client.get('/v2/exercises/', params=params).status_code == 400
+
+
+def test_search_ranks_name_matches_first_and_tracks_writes():
+    created = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise(
+        'test-fts-tagged', description='Variante con zancadas', tags=['remo']
+    )).json()
+    results = client.get('/v2/exercises/', params={'query': 'remo', 'highlight': 'true'}).json()
+    assert results[0]['name'].lower().startswith('remo')
+    assert '<mark>' in results[0]['highlight']['name']
+    assert created['id'] in [e['id'] for e in results]
+
+    client.delete(f"/v2/exercises/{created['id']}", params={'token': TOKEN})
+    results = client.get('/v2/exercises/', params={'query': 'remo'}).json()
+    assert created['id'] not in [e['id'] for e in results]
+
+
+def test_highlight_is_output_only():
+    r = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-highlight-input', highlight={'name': 'x'}))
+    assert r.status_code == 200
+    assert 'highlight' not in r.json()
+    assert client.get(f"/v2/exercises/{r.json()['id']}").json()['highlight'] is None
+
+
+def test_fuzzy_search_tolerates_typos_and_accents():
+    names = [e['name'] for e in client.get('/v2/exercises/', params={'query': 'sentadila bulgara'}).json()]
+    assert names and all('Bulgara' in n for n in names)
+    assert client.get('/v2/exercises/', params={'query': 'sentadila bulgara', 'match': 'exact'}).json() == []
+
+
+def test_postgres_search_folds_accents_on_both_sides(monkeypatch):
+    from app.config import settings
+    from app.fulltext import POSTGRES_VECTOR, TS_CONFIG, config_statements
+    from app.queries import build_list_query
+
+    monkeypatch.setattr(settings, 'DATABASE_URL', 'postgresql://user@host/db')
+    sql, _ = build_list_query('sentadilla búlgara', highlight=True)
+    assert "'spanish'" not in sql and "'spanish'" not in POSTGRES_VECTOR
+    assert f"to_tsquery('{TS_CONFIG}'" in sql and f"to_tsvector('{TS_CONFIG}'" in POSTGRES_VECTOR
+    assert 'WITH unaccent, spanish_stem' in config_statements()[-1]
+
+
+def test_trigram_index_folds_and_stems():
+    from app.search import TrigramIndex, normalize
+    assert normalize('Sentadillas Búlgaras') == ['sentadilla', 'bulgara']
+    index = TrigramIndex([{'id': 1, 'name': 'Curl Alterno Martillo'}, {'id': 2, 'name': 'Press Banca'}])
+    assert [i for i, _ in index.search('martilo')] == [1]
+
+
+def test_suggest_matches_word_prefixes_without_accents():
+    r = client.get('/v2/exercises/suggest', params={'prefix': 'BÚL', 'limit': 5})
+    assert r.status_code == 200
+    suggestions = r.json()
+    assert suggestions and all('Bulgara' in s['name'] for s in suggestions)
+    assert set(suggestions[0]) == {'id', 'slug', 'name'}
+
+
+def test_facet_counts_ignore_their_own_filter():
+    client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-facet-a', primary_muscle='Facetmuscle', equipment=['Facetbar']))
+    client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-facet-b', primary_muscle='Facetmuscle', equipment=['Facetband']))
+    client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-facet-c', primary_muscle='Othermuscle', equipment=['Facetbar']))
+
+    r = client.get('/v2/exercises/', params={'muscle': 'facetmuscle', 'equipment': 'facetbar', 'facets': 'true'})
+    body = r.json()
+    assert [e['slug'] for e in body['items']] == ['test-facet-a']
+    assert body['total'] == 1
+    assert body['next_cursor'] is None
+    assert body['facets']['equipment']['Facetbar'] == 1
+    assert body['facets']['equipment']['Facetband'] == 1
+    assert body['facets']['muscle']['Facetmuscle'] == 1
+    assert body['facets']['muscle']['Othermuscle'] == 1
+
+
+def test_boolean_filters_compile_to_one_query():
+    for slug, muscle, equipment, difficulty in [
+        ('test-bool-a', 'Boolchest', ['Booldb', 'Boolbench'], 'beginner'),
+        ('test-bool-b', 'Booltriceps', ['Booldb', 'Boolbench'], 'intermediate'),
+        ('test-bool-c', 'Boolchest', ['Booldb'], 'beginner'),
+        ('test-bool-d', 'Booltriceps', ['Booldb', 'Boolbench'], 'advanced'),
+        ('test-bool-e', 'Boolchest', ['Booldb', 'Boolbench', 'Boolband'], 'beginner'),
+    ]:
+        client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise(
+            slug, primary_muscle=muscle, equipment=equipment, difficulty=difficulty))
+
+    params = {
+        'muscle': 'boolchest,BOOLTRICEPS',
+        'equipment_all': 'booldb,boolbench',
+        'exclude_equipment': 'boolband',
+        'difficulty_max': 'intermedio',
+    }
+    expected = ['test-bool-a', 'test-bool-b']
+    assert [e['slug'] for e in client.get('/v2/exercises/', params=params).json()] == expected
+    # Same filters evaluated on the facet bitsets (fuzzy path)
+    fuzzy = client.get('/v2/exercises/', params={**params, 'query': 'test bool', 'match': 'fuzzy', 'sort': 'id'})
+    assert [e['slug'] for e in fuzzy.json()] == expected
+
+    r = client.get('/v2/exercises/', params={'difficulty_max': 'expert'})
+    assert r.status_code == 400
+
+
+def test_stats_follow_catalog_version():
+    before = client.get('/v2/exercises/stats').json()
+    r = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-stats', primary_muscle='Statsmuscle', difficulty=None))
+    after = client.get('/v2/exercises/stats').json()
+    assert after['version'] > before['version']
+    assert after['total_exercises'] == before['total_exercises'] + 1
+    assert after['muscle_groups']['Statsmuscle'] == 1
+    assert after['difficulty_levels'].get('Unknown', 0) == before['difficulty_levels'].get('Unknown', 0) + 1
+    assert 'generated_at' in after
+
+
+def test_conditional_get_returns_304_until_catalog_changes():
+    r = client.get('/v2/exercises/', params={'limit': 5})
+    etag = r.headers['etag']
+    assert r.headers['last-modified']
+    cached = client.get('/v2/exercises/', params={'limit': 5}, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.content == b''
+    assert client.get('/v2/exercises/stats', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-etag'))
+    fresh = client.get('/v2/exercises/', params={'limit': 5}, headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['etag'] != etag
+
+
+def test_images_map_is_served_with_validators():
+    r = client.get('/v2/exercises/images')
+    assert r.status_code == 200
+    assert client.get('/v2/exercises/images', headers={'If-None-Match': r.headers['etag']}).status_code == 304
+
+
+def test_list_items_are_served_from_snapshot_unless_row_changed():
+    from app.database import get_db_connection
+
+    created = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-fast-path', primary_muscle='Fastmuscle')).json()
+    listed = client.get('/v2/exercises/', params={'muscle': 'fastmuscle'}).json()
+    assert listed == [client.get(f"/v2/exercises/{created['id']}").json()]
+
+    # A write the snapshot has not seen yet (e.g. from another worker)
+    with get_db_connection() as conn:
+        conn.cursor().execute("UPDATE exercises SET name = 'Fast Path Renamed', updated_at = '2099-01-01T00:00:00' WHERE id = ?", (created['id'],))
+        conn.commit()
+    listed = client.get('/v2/exercises/', params={'muscle': 'fastmuscle'}).json()
+    assert listed[0]['name'] == 'Fast Path Renamed'
+
+
+def test_card_view_and_sparse_fields():
+    client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise(
+        'test-card-view', primary_muscle='Cardmuscle', tips=['keep it slow'],
+        images=[{'url': 'https://example.com/card.jpg'}]))
+
+    card = client.get('/v2/exercises/', params={'muscle': 'cardmuscle', 'view': 'card'}).json()[0]
+    assert set(card) == {'id', 'slug', 'name', 'primary_muscle', 'difficulty', 'equipment', 'thumbnail'}
+    assert card['thumbnail'] == 'https://example.com/card.jpg'
+
+    sparse = client.get('/v2/exercises/', params={'muscle': 'cardmuscle', 'fields': 'tips,name'}).json()[0]
+    assert sparse == {'id': card['id'], 'name': card['name'], 'tips': ['keep it slow']}
+
+    assert client.get('/v2/exercises/', params={'fields': 'name,password'}).status_code == 400
+
+
+def test_batch_preserves_order_and_reports_missing():
+    first = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-batch-one')).json()
+    second = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-batch-two')).json()
+
+    r = client.get('/v2/exercises/batch', params={
+        'ids': f"{second['id']},999999,{first['id']}",
+        'slugs': 'test-batch-one,no-such-slug',
+        'view': 'card',
+    })
+    body = r.json()
+    assert [e['id'] for e in body['items']] == [second['id'], first['id']]
+    assert body['missing_ids'] == [999999]
+    assert body['missing_slugs'] == ['no-such-slug']
+
+    assert client.get('/v2/exercises/batch', params={'ids': '1,x'}).status_code == 400
+    assert client.get('/v2/exercises/batch').status_code == 400
+
+
+def test_lookup_by_slug_and_duplicate_slug_conflict():
+    created = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-by-slug')).json()
+
+    r = client.get('/v2/exercises/by-slug/test-by-slug')
+    assert r.status_code == 200
+    assert r.json()['id'] == created['id']
+    assert client.get('/v2/exercises/by-slug/Test By Slug').json()['id'] == created['id']
+    assert client.get('/v2/exercises/by-slug/no-such-slug').status_code == 404
+
+    r = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-by-slug'))
+    assert r.status_code == 409
+
+
+def test_slugify_is_canonical():
+    assert catalog.slugify('Press de Banca (Inclinado)') == 'press-de-banca-inclinado'
+    assert catalog.slugify('  Extensión de Tríceps -- Polea ') == 'extension-de-triceps-polea'
+    assert catalog.slugify('Peso Muerto Rumano con Mancuernas Ñ') == 'peso-muerto-rumano-con-mancuernas-n'
+
+
+def test_changes_return_upserts_and_tombstones_since_version():
+    full = client.get('/v2/exercises/changes', params={'since': 0}).json()
+    assert full['reset'] is True
+    since = full['version']
+
+    kept = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-changes-kept')).json()
+    gone = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-changes-gone')).json()
+    client.delete(f"/v2/exercises/{gone['id']}", params={'token': TOKEN})
+
+    delta = client.get('/v2/exercises/changes', params={'since': since, 'view': 'card'}).json()
+    assert delta['reset'] is False
+    assert [e['slug'] for e in delta['upserts']] == ['test-changes-kept']
+    assert delta['deletes'] == [gone['id']]
+    assert delta['version'] > since
+
+    assert client.get('/v2/exercises/changes', params={'since': delta['version']}).json()['upserts'] == []
+    # A version from the future (e.g. database recreated) forces a reload
+    assert client.get('/v2/exercises/changes', params={'since': delta['version'] + 100}).json()['reset'] is True
+
+
+def test_expired_tombstones_force_a_reset():
+    from app.changes import expire_tombstones
+    from app.database import get_db_connection
+
+    since = client.get('/v2/exercises/changes', params={'since': 0}).json()['version']
+    gone = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-changes-expired')).json()
+    client.delete(f"/v2/exercises/{gone['id']}", params={'token': TOKEN})
+
+    with get_db_connection() as conn:
+        expire_tombstones(conn.cursor(), days=-1)
+        conn.commit()
+    assert client.get('/v2/exercises/changes', params={'since': since}).json()['reset'] is True
+
+
+def test_export_streams_ndjson_optionally_gzipped():
+    import json
+
+    plain = client.get('/v2/exercises/export', params={'view': 'card'}, headers={'Accept-Encoding': 'identity'})
+    assert plain.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in plain.content.splitlines()]
+    assert len(rows) == len(catalog.get_catalog().exercises)
+    assert [r['id'] for r in rows] == sorted(r['id'] for r in rows)
+    assert 'thumbnail' in rows[0]
+
+    compressed = client.get('/v2/exercises/export', params={'view': 'card'}, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['content-encoding'] == 'gzip'
+    # httpx decodes Content-Encoding transparently
+    assert compressed.content == plain.content
+
+
+def test_connections_are_pooled_and_measured():
+    from app.database import get_db_connection, get_pool_stats
+
+    with get_db_connection() as conn:
+        first = conn.dbapi_connection
+        assert conn.cursor().execute('SELECT 1 AS one').fetchone()['one'] == 1
+    with get_db_connection() as conn:
+        assert conn.dbapi_connection is first
+
+    stats = client.get('/health').json()['db_pool']
+    assert stats['checkouts'] >= 2
+    assert stats['checked_out'] == 0
+    assert get_pool_stats()['max_wait_ms'] >= stats['avg_wait_ms']
+
+
+def test_async_connections_share_the_query_surface(monkeypatch):
+    import asyncio
+    from app.async_database import get_async_db_connection, fetch_all, pool_capacity, numbered_placeholders, _get_sqlite_pool
+
+    async def run():
+        async with get_async_db_connection() as conn:
+            cursor = await conn.cursor()
+            await cursor.execute('SELECT id, name FROM exercises ORDER BY id LIMIT ?', (2,))
+            rows = await cursor.fetchall()
+        counts = await asyncio.gather(*(fetch_all('SELECT COUNT(*) AS count FROM exercises') for _ in range(50)))
+        return rows, counts
+
+    rows, counts = asyncio.run(run())
+    assert [row['id'] for row in rows] == [e['id'] for e in client.get('/v2/exercises/', params={'limit': 2}).json()]
+    assert {c[0]['count'] for c in counts} == {len(catalog.get_catalog().exercises)}
+
+    # The pool is bounded: once pool_capacity() connections are out, the next caller times out
+    pool = _get_sqlite_pool(readonly=True)
+    monkeypatch.setattr(pool, 'timeout', 0.05)
+
+    async def exhaust():
+        held = [await pool.acquire() for _ in range(pool_capacity())]
+        try:
+            with pytest.raises(TimeoutError):
+                await pool.acquire()
+        finally:
+            for conn in held:
+                await pool.release(conn)
+
+    asyncio.run(exhaust())
+
+    assert numbered_placeholders("SELECT %s WHERE name LIKE 'a%%' AND id = %s") == "SELECT $1 WHERE name LIKE 'a%' AND id = $2"
+
+
+def test_sqlite_profile_uses_wal_and_read_only_readers():
+    import sqlite3
+    from app.database import get_db_connection
+
+    with get_db_connection() as writer, get_db_connection(readonly=True) as reader:
+        assert writer.cursor().execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert reader.cursor().execute('PRAGMA busy_timeout').fetchone()[0] > 0
+        with pytest.raises(sqlite3.OperationalError):
+            reader.cursor().execute('UPDATE catalog_meta SET version = version')
+
+        # An open write transaction does not block readers
+        cursor = writer.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('UPDATE catalog_meta SET version = version + 1')
+        version = reader.cursor().execute('SELECT version FROM catalog_meta').fetchone()['version']
+        writer.rollback()
+    assert version == catalog.get_catalog().version
+
+
+def test_list_fields_are_normalized_into_indexed_relations():
+    from app.database import get_db_connection
+    from app.queries import build_list_query, parse_filters
+
+    r = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise(
+        'test-relations', equipment=['Relband', 'Relbar'], tags=['Reltag']))
+    exercise_id = r.json()['id']
+    sql, params = build_list_query(filters=parse_filters(equipment_all='relband,RELBAR'))
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        assert [row['id'] for row in cursor.execute(sql, params).fetchall()] == [exercise_id]
+        plan = ' '.join(row['detail'] for row in cursor.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        assert 'SEARCH r USING PRIMARY KEY' in plan and 'SCAN r' not in plan
+
+    client.put(f'/v2/exercises/{exercise_id}', params={'token': TOKEN}, json=new_exercise(
+        'test-relations', equipment=['Relband']))
+    assert client.get('/v2/exercises/', params={'equipment': 'relbar'}).json() == []
+    client.delete(f'/v2/exercises/{exercise_id}', params={'token': TOKEN})
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) AS count FROM exercise_equipment WHERE exercise_id = ?', (exercise_id,))
+        assert cursor.fetchone()['count'] == 0
+
+
+def test_bulk_insert_batches_rows_and_skips_duplicate_slugs(seeded):
+    from app.bulk_load import bulk_insert, convert, row_from_item
+    from app.database import get_db_connection
+
+    assert seeded['load']['rows'] == seeded['migrated']
+    # Unconvertible items and items without a name are skipped; a null slug falls back to the name
+    items = [{'name': f'Bulk {i % 2500}'} for i in range(3000)]
+    items += [None, {'name': None}, {'name': ' '}, {'name': 'Bulk Null', 'slug': None}]
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        load = bulk_insert(cursor, convert(items, row_from_item, '2024-01-01T00:00:00'), batch_size=1000)
+        cursor.execute("SELECT COUNT(*) AS count FROM exercises WHERE slug LIKE 'bulk-%'")
+        count = cursor.fetchone()['count']
+        conn.rollback()
+    assert (load['rows'], load['skipped'], count) == (2501, 503, 2501)
+
+
+def test_json_sources_are_streamed_element_by_element(tmp_path):
+    import json
+    from app.bulk_load import iter_json_array, normalize_items
+
+    items = [{'name': 'Uno', 'reps': 125}, 2.5, {'name': 'Tres', 'json_data': json.dumps({'name': 'Viejo', 'tags': ['a']})}]
+    path = tmp_path / 'source.json'
+    path.write_text(json.dumps(items, indent=2), encoding='utf-8')
+    # Tiny reads force elements (and numbers) to span several reads
+    assert list(iter_json_array(path, read_size=3)) == items
+    assert list(normalize_items(iter_json_array(path)))[2] == {'name': 'Tres', 'tags': ['a']}
+
+    for malformed in ('[{"name": "Uno"}, {"name": ', '[1,]', '[1 2]', '[,1]'):
+        path.write_text(malformed, encoding='utf-8')
+        with pytest.raises(ValueError):
+            list(iter_json_array(path))
+    path.write_text(' [ ] ', encoding='utf-8')
+    assert list(iter_json_array(path)) == []
+
+    # exercises_complete.json rows are unwrapped, so list fields and image metadata survive force-migrate
+    exercises = catalog.get_catalog().exercises
+    assert any(e['equipment'] for e in exercises)
+    image = client.get('/v2/exercises/by-slug/abdominales-maquina').json()['images'][0]
+    assert (image['type'], image['width'], image['height']) == ('demonstration', 800, 600)
+    assert image['url'].endswith('/static/images/abs/abdominales-maquina.png')
+
+
+def test_force_migrate_swaps_in_a_shadow_table_and_can_roll_back():
+    from app.catalog_swap import SHADOW_TABLE, create_shadow, validate_shadow, table_exists
+    from app.database import get_db_connection
+
+    client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-before-swap'))
+    r = client.post('/v2/exercises/force-migrate', params={'token': TOKEN})
+    assert r.status_code == 200
+    assert client.get('/v2/exercises/by-slug/test-before-swap').status_code == 404
+    # Relations and the full-text index were built on the shadow and follow the new ids
+    assert client.get('/v2/exercises/', params={'equipment': 'barbell'}).json()
+    assert client.get('/v2/exercises/', params={'query': 'press'}).json()
+
+    assert client.post('/v2/exercises/force-migrate/rollback', params={'token': TOKEN}).status_code == 200
+    assert client.get('/v2/exercises/by-slug/test-before-swap').status_code == 200
+    assert client.get('/v2/exercises/', params={'query': 'test before swap', 'match': 'exact'}).json()
+    # The rollback can itself be undone
+    assert client.post('/v2/exercises/force-migrate/rollback', params={'token': TOKEN}).status_code == 200
+    assert client.get('/v2/exercises/by-slug/test-before-swap').status_code == 404
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        create_shadow(cursor)
+        with pytest.raises(ValueError):
+            validate_shadow(cursor)
+        conn.rollback()
+        assert not table_exists(cursor, SHADOW_TABLE)
+
+    # Another import retires the parked catalog and drops it after the swap
+    client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-retired'))
+    assert client.post('/v2/exercises/force-migrate', params={'token': TOKEN}).status_code == 200
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        assert not table_exists(cursor, 'exercises_retired')
+        cursor.execute("SELECT COUNT(*) AS count FROM exercises_previous WHERE slug = 'test-retired'")
+        assert cursor.fetchone()['count'] == 1
+
+
+def test_swap_gives_up_cleanly_when_the_live_tables_stay_locked(monkeypatch):
+    import psycopg2.errors
+    from app import catalog_swap
+    from app.config import settings
+
+    class LockedCursor:
+        """PostgreSQL cursor whose live tables are held by a long reader"""
+        def __init__(self):
+            self.statements, self.rollbacks = [], 0
+            self.connection = self
+
+        def rollback(self):
+            self.rollbacks += 1
+
+        def execute(self, sql, params=()):
+            self.statements.append(sql)
+            if sql.startswith('ALTER TABLE'):
+                raise psycopg2.errors.LockNotAvailable()
+
+        def fetchone(self):
+            return {'present': False}
+
+    monkeypatch.setattr(settings, 'DATABASE_URL', 'postgresql://user@host/db')
+    monkeypatch.setattr(settings, 'CATALOG_SWAP_ATTEMPTS', 2)
+    monkeypatch.setattr(catalog_swap.time, 'sleep', lambda seconds: None)
+    cursor = LockedCursor()
+    with pytest.raises(TimeoutError):
+        catalog_swap.swap_in(cursor, catalog_swap.SHADOW)
+    timeouts = [sql for sql in cursor.statements if sql.startswith('SET LOCAL lock_timeout')]
+    assert len(timeouts) == 2 and cursor.rollbacks >= 2
+    assert cursor.statements[-1].startswith('ALTER TABLE')
+
+
+def test_bulk_upsert_reports_each_item():
+    client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-bulk-existing'))
+    before = catalog.get_catalog().version
+    items = [
+        new_exercise('test-bulk-existing', name='Renamed', tags=['bulk']),
+        new_exercise('test-bulk-new', equipment=['Sandbag']),
+        new_exercise('test-bulk-new'),
+        new_exercise('test-bulk-blank', name=' '),
+        new_exercise('test-bulk-invalid', images=[{'url': 'not a url'}]),
+        {'name': 'No slug'},
+    ]
+    r = client.post('/v2/exercises/bulk', params={'token': TOKEN}, json=items)
+    assert r.status_code == 200
+    body = r.json()
+    assert (body['created'], body['updated'], body['failed']) == (1, 1, 4)
+    assert [i['status'] for i in body['items']] == ['updated', 'created', 'error', 'error', 'error', 'error']
+    # Schema errors are reported per item instead of rejecting the request
+    assert body['items'][4]['slug'] == 'test-bulk-invalid' and 'images.0.url' in body['items'][4]['detail']
+    assert body['items'][5]['slug'] is None and 'slug' in body['items'][5]['detail']
+
+    assert catalog.get_catalog().version == before + 1
+    updated = client.get('/v2/exercises/by-slug/test-bulk-existing').json()
+    assert (updated['id'], updated['name']) == (body['items'][0]['id'], 'Renamed')
+    assert [e['slug'] for e in client.get('/v2/exercises/', params={'equipment': 'sandbag'}).json()] == ['test-bulk-new']
+    assert 'test-bulk-existing' in [e['slug'] for e in client.get('/v2/exercises/', params={'query': 'renamed'}).json()]
+
+    assert client.post('/v2/exercises/bulk', params={'token': TOKEN}, json=[]).status_code == 400
+
+
+def test_batch_sync_runs_a_fixed_number_of_statements():
+    from app.changes import record_changes
+    from app.database import get_db_connection
+    from app.fulltext import sync_search_index_many
+    from app.relations import sync_relations_many
+
+    class CountingCursor:
+        def __init__(self, cursor):
+            self.cursor, self.calls = cursor, 0
+
+        def execute(self, *args):
+            self.calls += 1
+            return self.cursor.execute(*args)
+
+        def executemany(self, sql, rows):
+            # psycopg2 runs one statement per row
+            rows = list(rows)
+            self.calls += len(rows)
+            return self.cursor.executemany(sql, rows)
+
+        def __getattr__(self, name):
+            return getattr(self.cursor, name)
+
+    def statements_for(ids):
+        with get_db_connection() as conn:
+            cursor = CountingCursor(conn.cursor())
+            sync_search_index_many(cursor, ids)
+            sync_relations_many(cursor, ids)
+            record_changes(cursor, 0, ids)
+            conn.rollback()
+            return cursor.calls
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM exercises ORDER BY id LIMIT 50")
+        ids = [row['id'] for row in cursor.fetchall()]
+    assert statements_for(ids[:1]) == statements_for(ids)
+
+    # Slug lookups bind the whole list as one parameter too
+    from app.bulk_load import slug_ids
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, slug FROM exercises WHERE id IN (?, ?)", ids[:2])
+        expected = {row['slug']: row['id'] for row in cursor.fetchall()}
+        statements = []
+        conn.set_trace_callback(statements.append)
+        assert slug_ids(cursor, [*expected, 'no-such-slug']) == expected
+        conn.set_trace_callback(None)
+    assert len(statements) == 1 and 'json_each' in statements[0]
+
+
+def test_patch_merges_changed_fields_with_optimistic_concurrency():
+    created = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise(
+        'test-patch', tips=['Tipo'], estimated={'sets': 3, 'reps': '10'}
+    )).json()
+    url = f"/v2/exercises/{created['id']}"
+    etag = client.get(url).headers['etag']
+    merge = {'Content-Type': 'application/merge-patch+json'}
+
+    r = client.patch(url, params={'token': TOKEN}, json={'tips': ['Typo fixed'], 'estimated': {'reps': '12'}, 'summary': None},
+                     headers={**merge, 'If-Match': etag})
+    assert r.status_code == 200
+    patched = r.json()
+    assert patched['tips'] == ['Typo fixed']
+    assert patched['estimated']['sets'] == 3 and patched['estimated']['reps'] == '12'
+    assert patched['equipment'] == ['barbell'] and patched['summary'] is None
+    assert r.headers['etag'] != etag
+    assert client.get(url).json() == patched
+    assert client.get(url, headers={'If-None-Match': r.headers['etag']}).status_code == 304
+
+    # The old ETag is stale now
+    stale = client.patch(url, params={'token': TOKEN}, json={'name': 'Lost update'}, headers={**merge, 'If-Match': etag})
+    assert stale.status_code == 412
+
+    # Nothing to change: no write, same version and ETag
+    version = catalog.get_catalog().version
+    same = client.patch(url, params={'token': TOKEN}, json={'tips': ['Typo fixed']}, headers=merge)
+    assert same.headers['etag'] == r.headers['etag']
+    assert catalog.get_catalog().version == version
+
+    assert client.patch(url, params={'token': TOKEN}, json={'id': 1}).status_code == 400
+    assert client.patch(url, params={'token': TOKEN}, json={'name': None}).status_code == 422
+    assert client.patch('/v2/exercises/999999', params={'token': TOKEN}, json={'name': 'x'}).status_code == 404
+
+
+def test_patch_works_on_sqlite_deployed_as_production(monkeypatch):
+    from app.config import settings
+
+    created = client.post('/v2/exercises/', params={'token': TOKEN}, json=new_exercise('test-patch-production')).json()
+    monkeypatch.setattr(settings, 'ENVIRONMENT', 'production')
+    assert settings.is_production and not settings.is_postgresql
+    r = client.patch(f"/v2/exercises/{created['id']}", params={'token': TOKEN}, json={'tips': ['Production']})
+    assert r.status_code == 200
+    assert r.json()['tips'] == ['Production']
+
+
+def test_bulk_upsert_stores_iso_timestamps_on_sqlite_deployed_as_production(monkeypatch):
+    from app.config import settings
+    from app.database import get_db_connection
+
+    monkeypatch.setattr(settings, 'ENVIRONMENT', 'production')
+    r = client.post('/v2/exercises/bulk', params={'token': TOKEN}, json=[new_exercise('test-bulk-production')])
+    assert r.json()['created'] == 1
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT created_at, updated_at FROM exercises WHERE slug = 'test-bulk-production'")
+        row = cursor.fetchone()
+    # Same text format as every other SQLite write (datetime.isoformat)
+    assert 'T' in row['created_at'] and 'T' in row['updated_at']